@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LearnMaterials', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='learnmaterial',
+            index=models.Index(fields=['name', 'id'], name='learnmaterial_name_id_idx'),
+        ),
+    ]
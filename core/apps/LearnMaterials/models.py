@@ -19,3 +19,9 @@ class LearnMaterial(models.Model):
     disciplines = models.ForeignKey(Discipline, models.CASCADE,
                                     verbose_name='Дисциплина, к которой принадлежит дидактический материал')
     stGroup = models.ForeignKey(StudyGroup, models.CASCADE, related_name='material_StudyGroup')
+
+    class Meta:
+        indexes = [
+            # Пагинация по курсору (LearnMaterialCursorPagination)
+            models.Index(fields=['name', 'id'], name='learnmaterial_name_id_idx'),
+        ]
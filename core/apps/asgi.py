@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apps.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'WARM_SERIALIZERS_ON_LOAD', False):
+    from project_lib.rest.serializers import lazy_serializer_registry  # noqa: E402
+
+    lazy_serializer_registry.warm(settings.SERIALIZER_WARMUP_MODULES)
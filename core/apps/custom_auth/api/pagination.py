@@ -0,0 +1,22 @@
+from project_lib.rest.pagination import CursorPagination
+
+
+class CustomUserCursorPagination(CursorPagination):
+    """
+    Пагинация пользователей по курсору (индекс customuser_surname_id_idx)
+    """
+    ordering = 'surname'
+
+
+class StudentCursorPagination(CursorPagination):
+    """
+    Пагинация студентов по курсору (первичный ключ)
+    """
+    ordering = 'id'
+
+
+class LearnMaterialCursorPagination(CursorPagination):
+    """
+    Пагинация дидактических материалов по курсору (индекс learnmaterial_name_id_idx)
+    """
+    ordering = 'name'
@@ -14,5 +14,6 @@ urlpatterns = [
                        views.CustomUserViewSet.as_view(
                            {'get': 'retrieve', 'patch': 'partial_update', 'delete': 'destroy'})),
                   path("builder/", views.UserBuilderApiView.as_view()),
+                  path("builder/batch/", views.UserBatchApiView.as_view()),
 
               ] + router.urls
@@ -4,21 +4,34 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 from UniformNew import serializers
+from project_lib.rest.fieldsets import SparseFieldsetMixin
+from project_lib.rest.query_plan import QuerySetPlanMixin
 from .. import models
+from .pagination import CustomUserCursorPagination
+from ..service.user_service.batch import BatchUserService
 from ..service.user_service.change_structure import CreateStructureUser
 
 
-class CustomUserViewSet(ModelViewSet):
+class CustomUserViewSet(SparseFieldsetMixin, ModelViewSet):
     """
     Представление для работы с CustomUser
+    При чтении набор полей можно ограничить параметром ?fields=id,name,user_user[id|group]
+    Список отдается страницами по курсору (фамилия, id)
     """
     queryset = models.CustomUser.objects.undeleted()
     serializer_class = serializers.CustomUserSerializer
+    pagination_class = CustomUserCursorPagination
+    sparse_fields_allowed = '__all__,user_user[__all__].group[id|name|course|direction],' \
+                            'teacher_user[id|department|is_lead_department]'
+    sparse_fields_max_depth = 2
 
 
-class UserDetailView(ModelViewSet):
-    queryset = models.CustomUser.objects \
-        .prefetch_related('soldiers__service_records', 'role_users__role').undeleted()
+class UserDetailView(QuerySetPlanMixin, ModelViewSet):
+    """
+    Детальная информация о пользователях
+    Связи подтягиваются по attrs сериалайзера через QuerySetPlanMixin
+    """
+    queryset = models.CustomUser.objects.undeleted()
     serializer_class = serializers.DetailUserSerializer
 
 
@@ -40,4 +53,25 @@ class UserBuilderApiView(APIView):
 
     def delete(self, request, *args, **kwargs):
         data = CreateStructureUser(request.data, CreateStructureUser.PROCESS_TYPE_DELETE).process()
+        if data and data.get('dry_run'):
+            # Предварительный просмотр удаления: отдаем количество затрагиваемых записей
+            return Response(data, status=status.HTTP_200_OK)
         return Response(data, status=status.HTTP_204_NO_CONTENT)
+
+
+class UserBatchApiView(APIView):
+    """
+    Пакетная обработка действий UserBuilderApiView в одной транзакции
+    Формат данных описан в BatchUserService
+    """
+
+    def post(self, request, *args, **kwargs):
+        result = BatchUserService(request.data).process()
+        if result.success:
+            response_status = status.HTTP_200_OK
+        elif result.committed:
+            # Часть действий выполнена, часть с ошибками
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(result.to_dict(), status=response_status)
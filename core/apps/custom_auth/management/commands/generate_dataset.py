@@ -0,0 +1,254 @@
+import argparse
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from random import Random
+from typing import Dict, List, Type
+from uuid import UUID
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+
+from ...models import (
+    CustomUser, Department, Discipline, DisciplinesTeacher, Student, StudentsGroups, StudyGroup, Teacher,
+    TeacherDepartment, University,
+)
+from ....LearnMaterials.models import LearnMaterial
+
+# Порядок вставки: родительские записи раньше дочерних
+MODELS_ORDER = (
+    University, Department, Discipline, StudyGroup, CustomUser, Teacher, TeacherDepartment, DisciplinesTeacher,
+    Student, StudentsGroups, LearnMaterial,
+)
+FILES_DIR = 'uploads/synthetic'
+MAX_SEED = 10000  # Метка seed в номере телефона занимает 4 цифры
+
+CITIES = ('Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Нижний Новгород', 'Самара',
+          'Томск', 'Воронеж', 'Пермь')
+SUBJECTS = ('Математика', 'Физика', 'Информатика', 'Химия', 'Экономика', 'История', 'Философия', 'Биология',
+            'Лингвистика', 'Механика', 'Электроника', 'Социология')
+DIRECTIONS = ('Прикладная информатика', 'Программная инженерия', 'Менеджмент', 'Юриспруденция',
+              'Электроэнергетика', 'Лингвистика', 'Экономика', 'Физика')
+MATERIAL_TYPES = ('лекция', 'практика', 'лабораторная', 'методичка', 'тест')
+MALE_NAMES = ('Иван', 'Петр', 'Олег', 'Сергей', 'Дмитрий', 'Алексей', 'Андрей', 'Максим', 'Артем', 'Никита')
+FEMALE_NAMES = ('Анна', 'Мария', 'Елена', 'Ольга', 'Ирина', 'Дарья', 'Полина', 'Софья', 'Алина', 'Ксения')
+SURNAMES = ('Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов', 'Михайлов',
+            'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров', 'Павлов')
+
+
+class Distribution:
+    """
+    Распределение количества дочерних записей:
+        10 - фиксированное значение
+        5-20 - равномерное от 5 до 20 включительно
+        normal:25:5 - нормальное со средним 25 и отклонением 5 (отрицательные значения дают 0)
+    """
+
+    def __init__(self, spec: str) -> None:
+        self.spec = spec
+        try:
+            if spec.startswith('normal:'):
+                _, mean, deviation = spec.split(':')
+                self.mean, self.deviation = float(mean), float(deviation)
+                self.sample = self._normal
+            elif '-' in spec:
+                low, high = spec.split('-')
+                self.low, self.high = int(low), int(high)
+                if self.low > self.high:
+                    raise ValueError
+                self.sample = self._uniform
+            else:
+                self.value = int(spec)
+                self.sample = self._fixed
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'Некорректное распределение "{spec}": ожидается N, A-B или normal:M:S')
+
+    def _fixed(self, rng: Random) -> int:
+        return self.value
+
+    def _uniform(self, rng: Random) -> int:
+        return rng.randint(self.low, self.high)
+
+    def _normal(self, rng: Random) -> int:
+        return max(0, round(rng.gauss(self.mean, self.deviation)))
+
+    def __repr__(self) -> str:
+        return self.spec
+
+
+class BulkWriter:
+    """
+    Буфер записей для bulk_create пачками.
+    При заполнении буфера модели сначала записываются буферы моделей раньше нее в MODELS_ORDER,
+    чтобы внешние ключи ссылались на уже вставленные записи
+    """
+
+    def __init__(self, batch_size: int, using: str) -> None:
+        self.batch_size = batch_size
+        self.using = using
+        self.buffers: Dict[Type[models.Model], List[models.Model]] = {model: [] for model in MODELS_ORDER}
+        self.counts = Counter()
+
+    def add(self, instance: models.Model) -> None:
+        buffer = self.buffers[type(instance)]
+        buffer.append(instance)
+        if len(buffer) >= self.batch_size:
+            self.flush(type(instance))
+
+    def flush(self, last: Type[models.Model] = None) -> None:
+        """
+        :param last: Записать буферы до этой модели включительно, по умолчанию все
+        """
+        for model in MODELS_ORDER:
+            buffer = self.buffers[model]
+            if buffer:
+                model.objects.using(self.using).bulk_create(buffer, batch_size=self.batch_size)
+                self.counts[model._meta.label] += len(buffer)
+                self.buffers[model] = []
+            if model is last:
+                break
+
+
+class Command(BaseCommand):
+    help = ('Генерация синтетических данных: университеты -> кафедры -> преподаватели -> дисциплины -> '
+            'группы -> студенты -> дидактические материалы. Одинаковый --seed дает одинаковые данные, '
+            'разные --seed не пересекаются (идентификаторы, телефоны и уникальные названия)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--universities', type=int, default=1, help='Количество университетов')
+        parser.add_argument('--departments', type=Distribution, default=Distribution('5-15'),
+                            help='Кафедр в университете (N, A-B или normal:M:S)')
+        parser.add_argument('--teachers', type=Distribution, default=Distribution('10-30'),
+                            help='Преподавателей на кафедре')
+        parser.add_argument('--disciplines', type=Distribution, default=Distribution('5-20'),
+                            help='Дисциплин кафедры')
+        parser.add_argument('--teacher-disciplines', type=Distribution, default=Distribution('1-3'),
+                            help='Дисциплин кафедры у преподавателя')
+        parser.add_argument('--groups', type=Distribution, default=Distribution('4-12'), help='Групп на кафедре')
+        parser.add_argument('--students', type=Distribution, default=Distribution('normal:25:5'),
+                            help='Студентов в группе')
+        parser.add_argument('--materials', type=Distribution, default=Distribution('0-20'),
+                            help='Дидактических материалов преподавателя')
+        parser.add_argument('--seed', type=int, default=42,
+                            help=f'Начальное значение генератора, от 0 до {MAX_SEED - 1}')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument('--files', action='store_true',
+                            help=f'Создавать файлы-заглушки материалов в хранилище ({FILES_DIR}), '
+                                 f'иначе сохраняется только имя файла')
+        parser.add_argument('--database', default='default', help='Псевдоним базы данных')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        if not 0 <= options['seed'] < MAX_SEED:
+            # seed целиком входит в телефоны (+7 и 16 цифр) и уникальные названия
+            raise CommandError(f'--seed должен быть от 0 до {MAX_SEED - 1}')
+        self.options = options
+        self.rng = Random(options['seed'])
+        # Метка seed в телефонах и уникальных названиях, чтобы наборы с разным seed не конфликтовали
+        self.tag = options['seed']
+        self.users = 0
+        writer = BulkWriter(options['batch_size'], options['database'])
+        started = time.perf_counter()
+        for number in range(options['universities']):
+            with transaction.atomic(using=options['database']):
+                self.generate_university(writer, number)
+                writer.flush()
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'Университет {number + 1}/{options["universities"]}: '
+                                  f'{sum(writer.counts.values())} записей, {time.perf_counter() - started:.1f} с')
+        seconds = time.perf_counter() - started
+        total = sum(writer.counts.values())
+        for model in MODELS_ORDER:
+            self.stdout.write(f'  {model._meta.label:<40} {writer.counts[model._meta.label]:>12}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {total} записей за {seconds:.1f} с ({total / seconds if seconds else 0:.0f} записей/с)'))
+
+    def uuid(self) -> UUID:
+        return UUID(int=self.rng.getrandbits(128), version=4)
+
+    def user(self, writer: BulkWriter, age: int) -> UUID:
+        """
+        Пользователь для студента или преподавателя
+        :param age: Примерный возраст в годах
+        """
+        rng = self.rng
+        gender = rng.choice(('male', 'female'))
+        self.users += 1
+        surname = rng.choice(SURNAMES)
+        user = CustomUser(
+            id=self.uuid(),
+            gender=gender,
+            name=rng.choice(MALE_NAMES if gender == 'male' else FEMALE_NAMES),
+            surname=surname if gender == 'male' else surname + 'а',
+            phone_number=f'+7{self.tag:04d}{self.users:012d}',
+            date_birth=datetime(2026 - age, 1, 1, tzinfo=timezone.utc) + timedelta(days=rng.randrange(365)),
+        )
+        writer.add(user)
+        return user.id
+
+    def generate_university(self, writer: BulkWriter, number: int) -> None:
+        rng, options = self.rng, self.options
+        university = University(id=self.uuid(), name=f'Университет {self.tag}-{number + 1}', city=rng.choice(CITIES))
+        writer.add(university)
+        for department_number in range(options['departments'].sample(rng)):
+            subject = rng.choice(SUBJECTS)
+            department = Department(id=self.uuid(), university_id=university.id,
+                                    name=f'Кафедра {subject} {self.tag}-{number + 1}-{department_number + 1}')
+            writer.add(department)
+
+            disciplines = []
+            for discipline_number in range(options['disciplines'].sample(rng)):
+                discipline = Discipline(id=self.uuid(), university_id=university.id,
+                                        name=f'{subject} {self.tag}-{number + 1}-{department_number + 1}-'
+                                             f'{discipline_number + 1}')
+                writer.add(discipline)
+                disciplines.append(discipline.id)
+
+            groups = []
+            for group_number in range(options['groups'].sample(rng)):
+                course = rng.randint(1, 6)
+                group = StudyGroup(id=self.uuid(), university_id=university.id,
+                                   name=f'{subject[:3].upper()}-{course}{group_number + 1:02d}', course=course,
+                                   type_education=rng.choice(StudyGroup.type_education_choices)[0],
+                                   direction=rng.choice(DIRECTIONS))
+                writer.add(group)
+                groups.append(group.id)
+                for student_number in range(options['students'].sample(rng)):
+                    student = Student(id=self.uuid(), user_id_id=self.user(writer, 17 + course), group_id=group.id,
+                                      is_headman=student_number == 0, grant=rng.choice(Student.choices)[0],
+                                      exam_points=rng.randint(0, 100))
+                    writer.add(student)
+                    writer.add(StudentsGroups(id=self.uuid(), group_id=group.id, student_id=student.id))
+            if not groups:
+                # Преподаватель и материал ссылаются на группу, без групп кафедра остается пустой
+                continue
+
+            for teacher_number in range(options['teachers'].sample(rng)):
+                teacher = Teacher(id=self.uuid(), user_id_id=self.user(writer, rng.randint(27, 70)),
+                                  groups_id=rng.choice(groups), department=subject[:20],
+                                  is_lead_department=teacher_number == 0)
+                writer.add(teacher)
+                writer.add(TeacherDepartment(id=self.uuid(), teacher_id=teacher.id, department_id=department.id))
+                taught = rng.sample(disciplines, min(len(disciplines), options['teacher_disciplines'].sample(rng)))
+                for discipline in taught:
+                    writer.add(DisciplinesTeacher(id=self.uuid(), discipline_id=discipline, teacher_id=teacher.id))
+                if not taught:
+                    continue
+                for material_number in range(options['materials'].sample(rng)):
+                    self.material(writer, university.id, teacher.id, rng.choice(taught), rng.choice(groups),
+                                  material_number)
+
+    def material(self, writer: BulkWriter, university: UUID, teacher: UUID, discipline: UUID, group: UUID,
+                 number: int) -> None:
+        material_type = self.rng.choice(MATERIAL_TYPES)
+        material = LearnMaterial(id=self.uuid(), name=f'{material_type.capitalize()} {number + 1}',
+                                 university_id=university, teacher_id=teacher, type=material_type,
+                                 disciplines_id=discipline, stGroup_id=group)
+        name = f'{FILES_DIR}/{material.id}.txt'
+        if self.options['files']:
+            name = default_storage.save(name, ContentFile(f'{material.name}\n{material.id}\n'.encode()))
+        material.file.name = name
+        writer.add(material)
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from project_lib.rest.authentication import make_token
+
+
+class Command(BaseCommand):
+    help = ('Выпуск подписанного токена API (SignedTokenAuthentication) для активного пользователя. '
+            'Токен выводится в stdout, клиент передает его заголовком Authorization: Token <token>')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Имя пользователя')
+
+    def handle(self, *args, **options):
+        model = get_user_model()
+        try:
+            user = model._default_manager.get_by_natural_key(options['username'])
+        except model.DoesNotExist:
+            raise CommandError(f'Пользователь {options["username"]} не найден')
+        if not user.is_active:
+            raise CommandError(f'Пользователь {options["username"]} не активен')
+        self.stdout.write(make_token(user.pk, username=user.get_username()))
+        max_age = getattr(settings, 'API_TOKEN_MAX_AGE', None)
+        if options['verbosity'] >= 2:
+            self.stderr.write(f'Срок действия: {f"{max_age} с" if max_age else "без ограничения"}')
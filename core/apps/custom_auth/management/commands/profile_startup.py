@@ -0,0 +1,181 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Загрузка проекта в отдельном процессе (python -X importtime), результат - JSON в последней строке stdout
+BOOT_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+from django.apps import config as apps_config
+
+ready_ms = {}
+_create = apps_config.AppConfig.create.__func__
+
+
+def _timed_create(cls, entry):
+    app_config = _create(cls, entry)
+    ready = app_config.ready
+
+    def timed_ready():
+        moment = time.perf_counter()
+        try:
+            ready()
+        finally:
+            ready_ms[app_config.label] = (time.perf_counter() - moment) * 1000
+
+    app_config.ready = timed_ready
+    return app_config
+
+
+apps_config.AppConfig.create = classmethod(_timed_create)
+phases = {}
+moment = time.perf_counter()
+django.setup()
+phases['setup'] = (time.perf_counter() - moment) * 1000
+
+from django.conf import settings
+from django.urls import get_resolver
+moment = time.perf_counter()
+resolver = get_resolver()
+resolver.url_patterns
+resolver._populate()
+phases['urls'] = (time.perf_counter() - moment) * 1000
+
+if 'serializers' in sys.argv[1:]:
+    import importlib
+    moment = time.perf_counter()
+    for module in getattr(settings, 'SERIALIZER_WARMUP_MODULES', []):
+        importlib.import_module(module)
+    from project_lib.rest.serializers import lazy_serializer_registry
+    lazy_serializer_registry.warm()
+    phases['serializers'] = (time.perf_counter() - moment) * 1000
+
+if 'checks' in sys.argv[1:]:
+    from django.core import checks
+    moment = time.perf_counter()
+    checks.run_checks()
+    phases['checks'] = (time.perf_counter() - moment) * 1000
+
+phases['total'] = (time.perf_counter() - started) * 1000
+print(json.dumps({'phases': phases, 'ready': ready_ms}))
+'''
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """
+    Разбор вывода python -X importtime
+    :return: Модули с собственным и накопленным временем импорта в мс
+    """
+    result = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        try:
+            result.append({
+                'module': name.strip(),
+                'self': int(self_us) / 1000,
+                'cumulative': int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            # Строка заголовка
+            continue
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Профилирование запуска проекта: время импорта модулей, ready() приложений, построение URL'
+    # Проверки выполняются в профилируемом процессе (--checks), а не в текущем
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Количество модулей в отчете')
+        parser.add_argument('--runs', type=int, default=1, help='Количество запусков, в отчет попадает самый быстрый')
+        parser.add_argument('--budget-ms', type=float, default=getattr(settings, 'STARTUP_BUDGET_MS', None),
+                            help='Допустимое время запуска, мс. По умолчанию STARTUP_BUDGET_MS')
+        parser.add_argument('--no-serializers', action='store_true',
+                            help='Не строить отложенные сериалайзеры (SERIALIZER_WARMUP_MODULES)')
+        parser.add_argument('--checks', action='store_true', help='Учитывать выполнение системных проверок')
+        parser.add_argument('--json', action='store_true', help='Вывести отчет в формате JSON')
+
+    def handle(self, *args, **options):
+        runs = [self.boot(warm=not options['no_serializers'], checks=options['checks'])
+                for _ in range(max(options['runs'], 1))]
+        report = min(runs, key=lambda run: run['phases']['total'])
+        report['packages'] = self.group_by_package(report['imports'])
+        top = options['top']
+        if options['json']:
+            report['imports'] = sorted(report['imports'], key=lambda i: i['self'], reverse=True)[:top]
+            report['packages'] = dict(list(report['packages'].items())[:top])
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            self.write_report(report, top)
+        budget = options['budget_ms']
+        total = report['phases']['total']
+        if budget is not None:
+            if total > budget:
+                raise CommandError(f'Время запуска {total:.1f} мс превышает бюджет {budget:.1f} мс')
+            self.stdout.write(self.style.SUCCESS(f'Время запуска {total:.1f} мс в пределах бюджета {budget:.1f} мс'))
+
+    @staticmethod
+    def boot(warm: bool, checks: bool) -> dict:
+        """
+        Загрузить проект в отдельном процессе
+        """
+        env = os.environ.copy()
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'apps.settings')
+        # Дочерний процесс должен находить модули так же как текущий
+        env['PYTHONPATH'] = os.pathsep.join(path for path in sys.path if path)
+        flags = [flag for flag, enabled in (('serializers', warm), ('checks', checks)) if enabled]
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT, *flags],
+            cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True,
+        )
+        if process.returncode != 0:
+            errors = '\n'.join(line for line in process.stderr.splitlines() if not line.startswith('import time:'))
+            raise CommandError(f'Ошибка загрузки проекта:\n{errors[-3000:]}')
+        try:
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            raise CommandError(f'Некорректный результат загрузки проекта:\n{process.stdout[-3000:]}')
+        result['imports'] = parse_importtime(process.stderr)
+        return result
+
+    @staticmethod
+    def group_by_package(imports: List[dict]) -> Dict[str, float]:
+        """
+        Собственное время импорта по пакетам верхнего уровня
+        """
+        packages = defaultdict(float)
+        for item in imports:
+            packages[item['module'].split('.')[0]] += item['self']
+        return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+
+    def write_report(self, report: dict, top: int) -> None:
+        phases = report['phases']
+        self.stdout.write(self.style.MIGRATE_HEADING('Этапы запуска, мс'))
+        for name, value in phases.items():
+            self.stdout.write(f'  {name:<20} {value:>10.1f}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('ready() приложений, мс'))
+        for label, value in sorted(report['ready'].items(), key=lambda item: item[1], reverse=True):
+            self.stdout.write(f'  {label:<30} {value:>10.2f}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Пакеты (собственное время импорта), мс'))
+        for package, value in list(report['packages'].items())[:top]:
+            self.stdout.write(f'  {package:<30} {value:>10.1f}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Модули (топ {top} по собственному времени), мс'))
+        self.stdout.write(f'  {"self":>10} {"cumulative":>12}  module')
+        for item in sorted(report['imports'], key=lambda i: i['self'], reverse=True)[:top]:
+            self.stdout.write(f'  {item["self"]:>10.2f} {item["cumulative"]:>12.2f}  {item["module"]}')
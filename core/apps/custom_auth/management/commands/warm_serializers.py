@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from project_lib.rest.serializers import lazy_serializer_registry
+
+
+class Command(BaseCommand):
+    help = 'Предварительное построение отложенных динамических сериалайзеров (lazy_serializer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*',
+                            help='Модули с отложенными сериалайзерами. По умолчанию SERIALIZER_WARMUP_MODULES')
+
+    def handle(self, *args, **options):
+        modules = options['modules'] or getattr(settings, 'SERIALIZER_WARMUP_MODULES', [])
+        result = lazy_serializer_registry.warm(modules)
+        self.stdout.write(self.style.SUCCESS(
+            f"Сериалайзеров: {result['count']}, построено: {result['built']} за {result['seconds']} с"))
+        for serializer in lazy_serializer_registry:
+            self.stdout.write(f'  {serializer!r}')
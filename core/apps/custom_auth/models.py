@@ -3,6 +3,7 @@ from uuid import uuid4
 from django.contrib.auth.models import AbstractBaseUser
 from django.utils import timezone
 from django.db import models
+from project_lib.models import SoftDeleteModel
 
 
 class University(models.Model):
@@ -11,7 +12,7 @@ class University(models.Model):
     city = models.CharField(db_column='city', verbose_name="город", max_length=50, unique=False)
 
 
-class CustomUser(models.Model):
+class CustomUser(SoftDeleteModel):
     USERNAME_FIELD = 'username'
     password = None
     last_login = None
@@ -27,6 +28,15 @@ class CustomUser(models.Model):
     avatar = models.ImageField(db_column="avatar", verbose_name="Аватарка пользователя", null=True)
     surname = models.CharField(db_column='surname', verbose_name="фамилия", max_length=20, null=True, unique=False)
 
+    class Meta:
+        indexes = [
+            # Пагинация по курсору (CustomUserCursorPagination)
+            models.Index(fields=['surname', 'id'], name='customuser_surname_id_idx'),
+            # Списки действующих пользователей (undeleted()), удаленные записи в индекс не попадают
+            models.Index(fields=['surname', 'id'], condition=models.Q(deleted_at__isnull=True),
+                         name='customuser_undeleted_idx'),
+        ]
+
 
 class Student(models.Model):
     choices = (
@@ -1,10 +1,11 @@
 from dataclasses import dataclass
-from typing import Callable, Type
+from typing import Callable, List, Type
 
 from loguru import logger
 from django.db import transaction
 from rest_framework.serializers import ModelSerializer
-from modules.core.apps.custom_auth.service.data_type.create_type import *
+from project_lib.rest.serializers import BulkWriteListSerializer
+from ..data_type.create_type import *
 
 
 @dataclass
@@ -22,6 +23,8 @@ class ActionRecord:
     data_discipline_teacher: DisciplinesTeacherData | dict = None
     data_teacher_department: TeacherDepartmentData | dict = None
     data_group: GroupData | dict = None
+    items: List[dict] = None  # Записи для массовых действий bulk_*
+    batch_size: int = None  # Количество записей в одном запросе массового сохранения
 
     def __post_init__(self):
         self.data_user = self.data_user and UserData(**self.data_user)
@@ -42,7 +45,10 @@ class ActionRecordForDelete:
     Контейнер для получения данных для удаления
     """
     action_type: str
-    id: str
+    id: str = None
+    ids: List[str] = None  # Удаление нескольких записей одним вызовом
+    dry_run: bool = False  # Только посчитать количество затрагиваемых записей
+    soft: bool = False  # Мягкое удаление (пометка deleted_at) вместо удаления записей
 
 
 class ActionErrorType(RuntimeError):
@@ -64,7 +70,12 @@ class BaseUserService:
         'save_all_for_user': '_save_all_for_user_record',
         'save_all_for_teacher': '_save_all_for_teacher_record',
         'delete_user': '_delete_user_record',
+        'bulk_save_user': '_bulk_save_user_record',
+        'bulk_save_student': '_bulk_save_student_record',
+        'bulk_save_teacher': '_bulk_save_teacher_record',
+        'bulk_save_group': '_bulk_save_group_record',
     }
+    BULK_BATCH_SIZE = 1000  # Количество записей в одном запросе INSERT/UPDATE по умолчанию
     PROCESS_TYPE_DELETE = 'delete'
     PROCESS_TYPE_UPDATE = 'update'
     PROCESS_TYPE_POST = 'post'
@@ -92,13 +103,31 @@ class BaseUserService:
         serializer.save()
         return serializer
 
+    def _bulk_save_serializer(self, serializer_class: Type[ModelSerializer], items: List[dict]) -> dict:
+        """
+        Массово сохранить записи: одна проверка списка, один запрос изменяемых записей,
+        bulk_create/bulk_update порциями по batch_size
+        :param items: Данные записей в формате сериалайзера. Записи с id изменяются, без id - создаются
+        """
+        if not isinstance(items, list):
+            raise ValueError('Для массового действия ожидался список записей items')
+        serializer = BulkWriteListSerializer(child=serializer_class(), data=items)
+        serializer.is_valid(raise_exception=True)
+        created = sum(instance is None for instance in serializer.instances_for_data)
+        instances = serializer.bulk_save(batch_size=self.action.batch_size or self.BULK_BATCH_SIZE)
+        return {
+            'created': created,
+            'updated': len(instances) - created,
+            'ids': [str(instance.pk) for instance in instances],
+        }
+
     def _dispatch_handler(self, name: str) -> (Callable, dict):
         """
         Получить метод обработки данных
         """
         value = self.ACTION_MAP.get(name)
-        handler = getattr(self, value, None)
+        handler = getattr(self, value, None) if value else None
         if handler is None:
             raise ActionErrorType(f'Передан не допустимый тип {name}. '
-                                  f'Допустимые типы действий: {"".join(self.ACTION_MAP.keys())}!')
+                                  f'Допустимые типы действий: {", ".join(self.ACTION_MAP.keys())}!')
         return handler
@@ -0,0 +1,208 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Type
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from loguru import logger
+from rest_framework.exceptions import APIException
+
+from project_lib.rest.exceptions import BadRequestError
+from .base import ActionErrorType, BaseUserService
+from .change_structure import CreateStructureUser
+
+REF_PREFIX = '$'  # Ссылка на результат предыдущего действия пакета: "$ref" или "$ref.field"
+REF_ESCAPE = '$$'  # Строка начинающаяся с $ передается как "$$..."
+
+# Ошибки действия, которые попадают в результат элемента пакета. Остальные исключения - ошибки сервера
+ITEM_ERRORS = (APIException, DjangoValidationError, ObjectDoesNotExist, Http404, IntegrityError, ActionErrorType,
+               ValueError)
+
+
+class BatchReferenceError(ValueError):
+    """
+    Ссылка на неизвестный или неуспешный элемент пакета
+    """
+
+
+@dataclass
+class BatchItemResult:
+    """
+    Результат обработки одного действия пакета
+    """
+    index: int
+    action_type: str
+    ref: Optional[str] = None
+    status: str = 'ok'
+    data: Any = None
+    errors: Any = None
+    duration_ms: float = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'index': self.index,
+            'ref': self.ref,
+            'action_type': self.action_type,
+            'status': self.status,
+            'data': self.data,
+            'errors': self.errors,
+            'duration_ms': self.duration_ms,
+        }
+
+
+@dataclass
+class BatchResult:
+    """
+    Результат обработки пакета
+    """
+    atomic: bool
+    items: List[BatchItemResult] = field(default_factory=list)
+    duration_ms: float = 0
+
+    @property
+    def success(self) -> bool:
+        return all(item.status == BatchUserService.STATUS_OK for item in self.items)
+
+    @property
+    def committed(self) -> bool:
+        """
+        Изменения сохранены (для atomic пакета - только если все действия успешны)
+        """
+        return self.success or not self.atomic
+
+    def to_dict(self) -> dict:
+        return {
+            'atomic': self.atomic,
+            'success': self.success,
+            'committed': self.committed,
+            'count': len(self.items),
+            'errors_count': sum(item.status != BatchUserService.STATUS_OK for item in self.items),
+            'duration_ms': self.duration_ms,
+            'results': [item.to_dict() for item in self.items],
+        }
+
+
+class BatchUserService:
+    """
+    Пакетная обработка действий CreateStructureUser в одной транзакции
+    Пример данных:
+        {
+            "atomic": true,
+            "actions": [
+                {"ref": "u1", "action_type": "save_user", "data_user": {"name": "Иван", ...}},
+                {"ref": "s1", "action_type": "save_student",
+                 "data_student": {"user_id": "$u1.id", "group_id": "$g1"}},
+                {"process_type": "delete", "action_type": "delete_user", "id": "..."}
+            ]
+        }
+    ref - имя элемента для ссылок из следующих действий, "$u1.id" заменяется полем id результата элемента u1,
+    "$u1" - тем же самым (по умолчанию берется id).
+    process_type - post (по умолчанию), update или delete.
+    Каждое действие выполняется в точке сохранения, ошибки собираются по элементам.
+    При atomic=true (по умолчанию) ошибка любого действия откатывает весь пакет,
+    при atomic=false откатываются только неуспешные действия.
+    """
+    STATUS_OK = 'ok'
+    STATUS_ERROR = 'error'
+    PROCESS_TYPES = (BaseUserService.PROCESS_TYPE_POST, BaseUserService.PROCESS_TYPE_UPDATE,
+                     BaseUserService.PROCESS_TYPE_DELETE)
+    DEFAULT_MAX_ITEMS = 1000
+    service_class: Type[BaseUserService] = CreateStructureUser
+
+    def __init__(self, data: dict) -> None:
+        """
+        :param data: Данные пакета {"atomic": bool, "actions": [...]}
+        """
+        if not isinstance(data, dict) or not isinstance(data.get('actions'), list):
+            raise BadRequestError({'_detail': 'Ожидался объект с массивом действий actions.'})
+        self.actions = data['actions']
+        self.atomic = bool(data.get('atomic', True))
+        max_items = getattr(settings, 'USER_BATCH_MAX_ITEMS', self.DEFAULT_MAX_ITEMS)
+        if len(self.actions) > max_items:
+            raise BadRequestError({'_detail': f'Максимально можно передать {max_items} действий в одном пакете.'})
+        self.refs = {}
+
+    def process(self) -> BatchResult:
+        result = BatchResult(atomic=self.atomic)
+        started = time.perf_counter()
+        with transaction.atomic():
+            for index, item in enumerate(self.actions):
+                result.items.append(self._process_item(index, item))
+            if not result.committed:
+                transaction.set_rollback(True)
+        result.duration_ms = self._elapsed_ms(started)
+        logger.debug(f'Обработка пакета действий: {len(result.items)} шт. за {result.duration_ms} мс, '
+                     f'ошибок: {sum(i.status != self.STATUS_OK for i in result.items)}')
+        return result
+
+    def _process_item(self, index: int, item) -> BatchItemResult:
+        started = time.perf_counter()
+        if not isinstance(item, dict):
+            return BatchItemResult(index, action_type=None, status=self.STATUS_ERROR,
+                                   errors={'_detail': 'Действие должно быть объектом.'})
+        item = dict(item)
+        ref = item.pop('ref', None)
+        process_type = item.pop('process_type', BaseUserService.PROCESS_TYPE_POST)
+        item_result = BatchItemResult(index, action_type=item.get('action_type'), ref=ref)
+        try:
+            if process_type not in self.PROCESS_TYPES:
+                raise ValueError(f'Недопустимый process_type {process_type}. '
+                                 f'Допустимые значения: {", ".join(self.PROCESS_TYPES)}')
+            if ref is not None and ref in self.refs:
+                raise ValueError(f'Элемент с ref {ref} уже есть в пакете')
+            service = self.get_service(self.resolve_refs(item), process_type)
+            # Точка сохранения: ошибка откатывает только это действие
+            with transaction.atomic():
+                item_result.data = service.process()
+        except ITEM_ERRORS as e:
+            item_result.status = self.STATUS_ERROR
+            item_result.errors = self._format_error(e)
+        else:
+            if ref is not None:
+                self.refs[ref] = item_result.data
+        item_result.duration_ms = self._elapsed_ms(started)
+        return item_result
+
+    def get_service(self, data: dict, process_type: str) -> BaseUserService:
+        """
+        Сервис действия. Неизвестные или недостающие поля данных - ошибка элемента, а не сервера
+        """
+        try:
+            return self.service_class(data, process_type)
+        except TypeError as e:
+            raise BadRequestError({'_detail': f'Некорректная структура действия: {e}'})
+
+    def resolve_refs(self, value):
+        """
+        Замена ссылок "$ref.field" на значения из результатов предыдущих действий
+        """
+        if isinstance(value, dict):
+            return {key: self.resolve_refs(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve_refs(item) for item in value]
+        if not isinstance(value, str) or not value.startswith(REF_PREFIX):
+            return value
+        if value.startswith(REF_ESCAPE):
+            return value[1:]
+        ref, _, field_name = value[len(REF_PREFIX):].partition('.')
+        if ref not in self.refs:
+            raise BatchReferenceError(f'Ссылка {value} на неизвестный или неуспешный элемент пакета')
+        data = self.refs[ref]
+        field_name = field_name or 'id'
+        if not isinstance(data, dict) or field_name not in data:
+            raise BatchReferenceError(f'Ссылка {value}: в результате элемента {ref} нет поля {field_name}')
+        return data[field_name]
+
+    @staticmethod
+    def _format_error(error: Exception):
+        if isinstance(error, APIException):
+            return error.detail
+        if isinstance(error, DjangoValidationError):
+            return error.message_dict if hasattr(error, 'error_dict') else {'_detail': error.messages}
+        return {'_detail': str(error)}
+
+    @staticmethod
+    def _elapsed_ms(started: float) -> float:
+        return round((time.perf_counter() - started) * 1000, 3)
@@ -1,19 +1,23 @@
 from datetime import datetime
 from ..user_service.base import BaseUserService
-from UniformNew.core.project_lib.rest.serializers import DynamicSerializerModel
+from ..user_service.delete import CascadeDeleteService, FastDeleteError
+from django.core.exceptions import ValidationError as DjangoValidationError
+from project_lib.rest.exceptions import BadRequestError, Conflict
+from project_lib.rest.serializers import lazy_serializer
 from rest_framework.generics import get_object_or_404
 
 from ...models import *
 
-UserSerializer = DynamicSerializerModel(model=CustomUser).build()
-StudentSerializer = DynamicSerializerModel(model=Student).build()
-TeacherSerializer = DynamicSerializerModel(model=Teacher).build()
-UniversitySerializer = DynamicSerializerModel(model=University).build()
-DisciplineSerializer = DynamicSerializerModel(model=Discipline).build()
-DepartmentSerializer = DynamicSerializerModel(model=Department).build()
-GroupSerializer = DynamicSerializerModel(model=StudyGroup).build()
-DisciplinesTeacherSerializer = DynamicSerializerModel(model=DisciplinesTeacher).build()
-TeacherDepartmentSerializer = DynamicSerializerModel(model=TeacherDepartment).build()
+# Сериалайзеры строятся при первом использовании, предварительно - командой warm_serializers
+UserSerializer = lazy_serializer(model=CustomUser)
+StudentSerializer = lazy_serializer(model=Student)
+TeacherSerializer = lazy_serializer(model=Teacher)
+UniversitySerializer = lazy_serializer(model=University)
+DisciplineSerializer = lazy_serializer(model=Discipline)
+DepartmentSerializer = lazy_serializer(model=Department)
+GroupSerializer = lazy_serializer(model=StudyGroup)
+DisciplinesTeacherSerializer = lazy_serializer(model=DisciplinesTeacher)
+TeacherDepartmentSerializer = lazy_serializer(model=TeacherDepartment)
 
 
 class CreateStructureUser(BaseUserService):
@@ -180,9 +184,69 @@ class CreateStructureUser(BaseUserService):
             return self._save_serializer(GroupSerializer, data, instance).data
         return self._save_serializer(GroupSerializer, data).data
 
+    def _bulk_save_user_record(self):
+        """
+        Массовое создание/изменение пользователей
+        """
+        return self._bulk_save_serializer(UserSerializer, self.action.items)
+
+    def _bulk_save_student_record(self):
+        """
+        Массовое создание/изменение студентов
+        """
+        return self._bulk_save_serializer(StudentSerializer, self.action.items)
+
+    def _bulk_save_teacher_record(self):
+        """
+        Массовое создание/изменение преподавателей
+        """
+        return self._bulk_save_serializer(TeacherSerializer, self.action.items)
+
+    def _bulk_save_group_record(self):
+        """
+        Массовое создание/изменение учебных групп
+        """
+        return self._bulk_save_serializer(GroupSerializer, self.action.items)
+
     def _delete_user_record(self):
         """
-        Удаление User (подтягиваются остальные данные средствами Django)
+        Удаление User и всех зависимых записей множественными запросами DELETE без загрузки в память
+        Поддерживается удаление нескольких пользователей (ids) и режим dry_run с количеством записей
+        При soft=True пользователи помечаются удаленными одним UPDATE, зависимые записи не изменяются
         """
-        user = get_object_or_404(CustomUser.objects.all().undeleted(), pk=self.action.id)
-        user.delete()
+        not_found = []
+        if self.action.ids:
+            ids = self._parse_user_ids(self.action.ids)
+            found = set(CustomUser.objects.all().undeleted().filter(pk__in=ids).values_list('pk', flat=True))
+            not_found = [str(pk) for pk in ids if pk not in found]
+            queryset = CustomUser.objects.filter(pk__in=found)
+        else:
+            user = get_object_or_404(CustomUser.objects.all().undeleted(), pk=self._parse_user_ids([self.action.id])[0])
+            queryset = CustomUser.objects.filter(pk=user.pk)
+        if self.action.soft:
+            count = queryset.count() if self.action.dry_run else queryset.soft_delete()
+            result = {'dry_run': self.action.dry_run, 'total': count, 'counts': {CustomUser._meta.label: count}}
+        else:
+            try:
+                result = CascadeDeleteService(CustomUser).delete(queryset, dry_run=self.action.dry_run)
+            except FastDeleteError as e:
+                raise Conflict(str(e))
+        # Не найденные (или уже удаленные) пользователи из ids
+        result['not_found'] = not_found
+        return result
+
+    @staticmethod
+    def _parse_user_ids(ids) -> list:
+        """
+        Привести идентификаторы пользователей к типу первичного ключа
+        """
+        pk_field = CustomUser._meta.pk
+        result, invalid = [], []
+        for value in ids:
+            try:
+                result.append(pk_field.to_python(value))
+            except DjangoValidationError:
+                invalid.append(str(value))
+        if invalid:
+            raise BadRequestError({'_detail': 'Некорректный идентификатор пользователя.', 'invalid_ids': invalid})
+        return result
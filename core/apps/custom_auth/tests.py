@@ -0,0 +1,450 @@
+import time
+from io import StringIO
+from math import ceil
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory
+from rest_framework_bulk import BulkSerializerMixin
+
+from project_lib.rest.authentication import SignedTokenAuthentication
+from project_lib.rest.counting import CountResult, CountStrategy, estimate_table_rows
+from project_lib.rest.metrics import get_registry, metrics_view
+from project_lib.rest.serializers.bulk import BulkListSerializerFixUUID
+from .api.views import CustomUserViewSet, UserDetailView
+from .models import (
+    CustomUser, Department, Discipline, DisciplinesTeacher, Student, StudentsGroups, StudyGroup, Teacher,
+    TeacherDepartment, University,
+)
+from .service.user_service.change_structure import CreateStructureUser
+from .service.user_service.delete import CascadeDeleteService
+from ..LearnMaterials.models import LearnMaterial
+
+urlpatterns = [
+    path('api/', include('apps.custom_auth.api.urls')),
+    path('metrics', metrics_view),
+]
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    MIDDLEWARE=['project_lib.rest.middleware.MetricsMiddleware'],
+    METRICS_ENABLED=True,
+    METRICS_DIR=None,
+    SERIALIZER_PROFILING=True,
+    SERIALIZER_PROFILING_HEADER=True,
+)
+class SerializerProfilingTest(TestCase):
+    """
+    Профиль вложенных полей собирается сериалайзером и читается MetricsMiddleware из одного контекста
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        university = University.objects.create(name='Университет', city='Москва')
+        group = StudyGroup.objects.create(university=university, name='ГР-101', course=1,
+                                          type_education='magistracy', direction='Информатика')
+        for i in range(3):
+            user = CustomUser.objects.create(name=f'Иван{i}', surname='Иванов', phone_number=f'+7900000000{i}')
+            Student.objects.create(user_id=user, group=group, grant='classic', exam_points=i)
+
+    def test_server_timing_has_field_path(self):
+        response = self.client.get('/api/custom_user/', {'fields': 'id,user_user[id|group]'})
+        self.assertEqual(response.status_code, 200)
+        entries = [entry.strip() for entry in response['Server-Timing'].split(',')]
+        self.assertTrue(any(entry.startswith('ser.user_user;') for entry in entries), entries)
+        self.assertIn('3 calls', next(entry for entry in entries if entry.startswith('ser.user_user;')))
+
+    def test_field_histogram_has_path_label(self):
+        self.client.get('/api/custom_user/', {'fields': 'id,user_user[id|group]'})
+        paths = {dict(labels).get('path') for name, labels in get_registry().histograms
+                 if name == 'serializer_field_seconds'}
+        self.assertIn('user_user', paths)
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    MIDDLEWARE=['project_lib.rest.middleware.MetricsMiddleware'],
+    METRICS_ENABLED=True,
+    METRICS_DIR=None,
+)
+class ExceptionMetricsTest(TestCase):
+    """
+    Ошибки обработанные DRF учитываются в http_exceptions_total через EXCEPTION_HANDLER
+    """
+
+    def exceptions_total(self, exception: str) -> float:
+        return sum(value for (name, labels), value in get_registry().counters.items()
+                   if name == 'http_exceptions_total' and dict(labels).get('exception') == exception)
+
+    def test_not_found_counted(self):
+        before = self.exceptions_total('Http404')
+        response = self.client.get('/api/custom_user/00000000-0000-0000-0000-000000000000/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.exceptions_total('Http404'), before + 1)
+        # Формат ответа стандартного обработчика DRF
+        self.assertIn('detail', response.json())
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    MIDDLEWARE=['django.contrib.sessions.middleware.SessionMiddleware',
+                'django.contrib.auth.middleware.AuthenticationMiddleware'],
+    METRICS_ALLOWED_IPS=('127.0.0.1',),
+)
+class MetricsViewTest(TestCase):
+    """
+    /metrics доступен с METRICS_ALLOWED_IPS и сотрудникам
+    """
+
+    def test_allowed_ip(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 200)
+
+    def test_other_ip_forbidden(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+    def test_staff(self):
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class SparseFieldsetTest(TestCase):
+    """
+    Ошибка синтаксиса ?fields= возвращается клиенту как 400 с позицией ошибки
+    """
+
+    def test_malformed_fields(self):
+        response = self.client.get('/api/custom_user/', {'fields': 'a[b'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['position'], 3)
+
+
+def cursor_of(link: str) -> str:
+    return parse_qs(urlparse(link).query)['cursor'][0]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class CursorPaginationTest(TestCase):
+    """
+    Список CustomUserViewSet страницами по подписанному курсору (фамилия, id)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, surname in enumerate(('Петров', 'Иванов', 'Сидоров', 'Иванов', None)):
+            CustomUser.objects.create(name=f'Иван{i}', surname=surname, phone_number=f'+7900000001{i}')
+        cls.expected = [str(pk) for pk in CustomUser.objects.order_by(F('surname').asc(nulls_last=True), 'id')
+                        .values_list('id', flat=True)]
+
+    def test_cursor_round_trip(self):
+        pages, response = [], self.client.get('/api/custom_user/', {'limit': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([item['id'] for item in response.data['results']])
+            if not response.data['next']:
+                break
+            response = self.client.get('/api/custom_user/', {'limit': 2, 'cursor': cursor_of(response.data['next'])})
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+        # Обратно от последней страницы по ссылкам previous
+        previous = self.client.get('/api/custom_user/', {'limit': 2, 'cursor': cursor_of(response.data['previous'])})
+        self.assertEqual([item['id'] for item in previous.data['results']], pages[1])
+        self.assertTrue(previous.data['next'])
+
+    def test_tampered_cursor(self):
+        response = self.client.get('/api/custom_user/', {'limit': 2})
+        cursor = cursor_of(response.data['next'])
+        tampered = cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')
+        response = self.client.get('/api/custom_user/', {'limit': 2, 'cursor': tampered})
+        self.assertEqual(response.status_code, 404)
+
+    def test_filter_mode_envelope(self):
+        # При фильтрации без limit отдаются все записи в обертке count/results
+        response = self.client.get('/api/custom_user/', {'filter': 'name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), ['count', 'count_exact', 'next', 'previous', 'results'])
+        self.assertEqual(response.data['count'], len(self.expected))
+        self.assertTrue(response.data['count_exact'])
+        self.assertEqual([item['id'] for item in response.data['results']], self.expected)
+        self.assertIsNone(response.data['next'])
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class UserBatchTest(TestCase):
+    """
+    Пакет действий UserBuilderApiView: ссылки на результаты, откат и ошибки по элементам
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        university = University.objects.create(name='Университет', city='Москва')
+        cls.group = StudyGroup.objects.create(university=university, name='ГР-101', course=1,
+                                              type_education='magistracy', direction='Информатика')
+
+    def post_batch(self, actions: list, atomic: bool = True):
+        return self.client.post('/api/builder/batch/', {'atomic': atomic, 'actions': actions},
+                                content_type='application/json')
+
+    @staticmethod
+    def save_user(ref: str, phone_number: str, **extra) -> dict:
+        data_user = {'name': 'Иван', 'surname': 'Иванов', 'phone_number': phone_number, 'gender': 'male', **extra}
+        return {'ref': ref, 'action_type': 'save_user', 'data_user': data_user}
+
+    def test_refs(self):
+        response = self.post_batch([
+            self.save_user('u1', '+79000000001', name='$$Иван'),
+            # Изменение созданного пользователя: id из "$u1", фамилия из поля результата "$u1.phone_number"
+            self.save_user('u2', '+79000000002', id='$u1', surname='$u1.phone_number'),
+            self.save_user('u3', '+79000000003', surname='$u1.phone'),
+            self.save_user('u4', '+79000000004', surname='$u3.surname'),
+        ], atomic=False)
+        self.assertEqual(response.status_code, 207)
+        results = response.json()['results']
+        self.assertEqual([item['status'] for item in results], ['ok', 'ok', 'error', 'error'])
+        self.assertEqual(results[0]['data']['name'], '$Иван')
+        self.assertEqual(results[1]['data']['id'], results[0]['data']['id'])
+        user = CustomUser.objects.get(pk=results[0]['data']['id'])
+        self.assertEqual((user.surname, user.phone_number), ('+79000000001', '+79000000002'))
+        self.assertIn('$u1.phone', results[2]['errors']['_detail'])
+        self.assertIn('$u3.surname', results[3]['errors']['_detail'])
+
+    def test_atomic_rollback(self):
+        actions = [self.save_user('u1', '+79000000001'), self.save_user('u2', '+79000000002', unknown=1)]
+        response = self.post_batch(actions, atomic=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['committed'])
+        self.assertFalse(CustomUser.objects.exists())
+
+        response = self.post_batch(actions, atomic=False)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([item['status'] for item in response.json()['results']], ['ok', 'error'])
+        self.assertEqual(list(CustomUser.objects.values_list('phone_number', flat=True)), ['+79000000001'])
+
+    def test_missing_id(self):
+        response = self.post_batch([
+            self.save_user('u1', '+79000000001'),
+            {'process_type': 'delete', 'action_type': 'delete_user', 'id': '00000000-0000-0000-0000-000000000000'},
+        ], atomic=False)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([item['status'] for item in response.json()['results']], ['ok', 'error'])
+        self.assertTrue(CustomUser.objects.filter(phone_number='+79000000001').exists())
+
+
+class CountEstimateTest(TestCase):
+    """
+    Оценка количества строк по sqlite_stat1 при частичном индексе неудаленных записей
+    """
+
+    def test_estimate_with_soft_deleted(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Статистика sqlite_stat1')
+        CustomUser.objects.bulk_create([CustomUser(name='Иван', surname='Иванов', phone_number=f'+7900000{i:04d}')
+                                        for i in range(20)])
+        CustomUser.objects.filter(phone_number__lt='+79000000005').soft_delete()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimate_table_rows(CustomUser), 20)
+        result = CountStrategy(estimate=True, estimate_threshold=10).count(CustomUser.objects.all())
+        self.assertEqual(result, CountResult(20, False))
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class CascadeDeleteTest(TestCase):
+    """
+    Быстрое каскадное удаление пользователей (CascadeDeleteService, delete_user) в сравнении с Collector
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        university = University.objects.create(name='Университет', city='Москва')
+        group = StudyGroup.objects.create(university=university, name='ГР-101', course=1,
+                                          type_education='magistracy', direction='Информатика')
+        department = Department.objects.create(university=university, name='Кафедра')
+        discipline = Discipline.objects.create(university=university, name='Математика')
+        cls.users = []
+        for i in range(3):
+            user = CustomUser.objects.create(name=f'Иван{i}', surname='Иванов', phone_number=f'+7900000000{i}')
+            cls.users.append(user)
+            for _ in range(i + 1):
+                student = Student.objects.create(user_id=user, group=group, grant='classic', exam_points=i)
+                StudentsGroups.objects.create(group=group, student=student)
+            teacher = Teacher.objects.create(user_id=user, groups=group, department='ИТ')
+            TeacherDepartment.objects.create(teacher=teacher, department=department)
+            DisciplinesTeacher.objects.create(discipline=discipline, teacher=teacher)
+            LearnMaterial.objects.create(name='Лекция', university=university, teacher=teacher, file='a.txt',
+                                         type='лекция', disciplines=discipline, stGroup=group)
+
+    def delete_user(self, **data):
+        return self.client.delete('/api/builder/', {'action_type': 'delete_user', **data},
+                                  content_type='application/json')
+
+    def test_counts_match_collector(self):
+        ids = [user.pk for user in self.users[:2]]
+        with transaction.atomic():
+            _, expected = CustomUser.objects.filter(pk__in=ids).delete()
+            transaction.set_rollback(True)
+        expected = {label: count for label, count in expected.items() if count}
+
+        result = CascadeDeleteService(CustomUser).delete(CustomUser.objects.filter(pk__in=ids))
+        self.assertEqual(dict(result['counts']), expected)
+        self.assertEqual(result['total'], sum(expected.values()))
+        self.assertEqual(list(CustomUser.objects.values_list('pk', flat=True)), [self.users[2].pk])
+        self.assertEqual(Student.objects.count(), 3)
+        self.assertEqual(LearnMaterial.objects.count(), 1)
+
+    def test_dry_run(self):
+        response = self.delete_user(ids=[str(self.users[0].pk)], dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['counts']['custom_auth.Student'], 1)
+        self.assertEqual(CustomUser.objects.count(), 3)
+        self.assertEqual(Student.objects.count(), 6)
+
+    def test_found_and_not_found_ids(self):
+        missing = '00000000-0000-0000-0000-000000000000'
+        result = CreateStructureUser({'action_type': 'delete_user', 'ids': [str(self.users[0].pk), missing]},
+                                     CreateStructureUser.PROCESS_TYPE_DELETE).process()
+        self.assertEqual(result['not_found'], [missing])
+        self.assertEqual(result['counts']['custom_auth.CustomUser'], 1)
+        self.assertFalse(CustomUser.objects.filter(pk=self.users[0].pk).exists())
+
+    def test_protect(self):
+        relation = Student._meta.get_field('user_id').remote_field
+        with mock.patch.object(relation, 'on_delete', models.PROTECT):
+            response = self.delete_user(id=str(self.users[0].pk))
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(CustomUser.objects.filter(pk=self.users[0].pk).exists())
+
+    def test_delete_signal_listener_refused(self):
+        def listener(**kwargs):
+            pass
+
+        post_delete.connect(listener, sender=LearnMaterial)
+        self.addCleanup(post_delete.disconnect, listener, sender=LearnMaterial)
+        response = self.delete_user(id=str(self.users[0].pk))
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('LearnMaterials.LearnMaterial', response.json()['detail'])
+        self.assertEqual(LearnMaterial.objects.count(), 3)
+
+
+@override_settings(ROOT_URLCONF=__name__, API_TOKEN_MAX_AGE=60)
+class SignedTokenTest(TestCase):
+    """
+    Токен API из команды issue_api_token: проверка подписи и срока жизни без сессии
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('api-client')
+
+    def issue_token(self) -> str:
+        out = StringIO()
+        call_command('issue_api_token', 'api-client', stdout=out)
+        return out.getvalue().strip()
+
+    def get(self, token: str):
+        return self.client.get('/api/custom_user/', HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_valid_token(self):
+        token = self.issue_token()
+        user, _ = SignedTokenAuthentication().authenticate(
+            APIRequestFactory().get('/api/custom_user/', HTTP_AUTHORIZATION=f'Token {token}'))
+        self.assertEqual(user.pk, str(self.user.pk))
+        response = self.get(token)
+        self.assertEqual(response.status_code, 200)
+        # API без состояния: сессия не создается и cookie не отправляется
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(response.has_header('Set-Cookie'))
+
+    def test_expired_token(self):
+        token = self.issue_token()
+        with mock.patch('time.time', return_value=time.time() + 61):
+            response = self.get(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Срок действия токена истек.')
+
+    def test_tampered_token(self):
+        token = self.issue_token()
+        response = self.get(token[:-1] + ('A' if token[-1] != 'A' else 'B'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Недействительный токен.')
+
+    def test_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(CommandError):
+            self.issue_token()
+
+
+class QuerySetPlanWithoutRequestTest(TestCase):
+    """
+    get_queryset() представления без запроса (генерация схемы) не ограничивает колонки
+    """
+
+    def test_without_request(self):
+        for view_class in (UserDetailView, CustomUserViewSet):
+            queryset = view_class().get_queryset()
+            self.assertEqual(queryset.query.deferred_loading, (frozenset(), True), view_class)
+
+
+class StudentBulkSerializer(BulkSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Student
+        fields = '__all__'
+        list_serializer_class = BulkListSerializerFixUUID
+        extra_kwargs = {'id': {'read_only': False, 'validators': []}}
+
+
+class BulkUpdateTest(TestCase):
+    """
+    Пакетное изменение BulkListSerializerFixUUID: количество запросов не зависит от количества записей
+    """
+    UPDATE_FIELDS = ['pk', 'pk', 'exam_points', 'group']  # Параметры одной записи в bulk_update
+
+    @classmethod
+    def setUpTestData(cls):
+        university = University.objects.create(name='Университет', city='Москва')
+        cls.groups = StudyGroup.objects.bulk_create([
+            StudyGroup(university=university, name=f'ГР-10{i}', course=1, type_education='magistracy',
+                       direction='Информатика') for i in range(2)])
+        user = CustomUser.objects.create(name='Иван', surname='Иванов', phone_number='+79000000001')
+        Student.objects.bulk_create([Student(user_id=user, group=cls.groups[0], grant='classic', exam_points=0)
+                                     for _ in range(1010)])
+
+    def update(self, start: int, rows: int) -> int:
+        """
+        Изменить rows студентов начиная с start
+        :return: Количество запросов
+        """
+        students = list(Student.objects.order_by('id').values_list('id', flat=True)[start:start + rows])
+        data = [{'id': str(pk), 'exam_points': i % 100 + 1, 'group': str(self.groups[1].pk)}
+                for i, pk in enumerate(students)]
+        request = mock.Mock(method='PATCH')
+        with CaptureQueriesContext(connection) as queries:
+            serializer = StudentBulkSerializer(Student.objects.all(), data=data, many=True, partial=True,
+                                               context={'view': mock.Mock(request=request)})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        saved = {str(pk): (points, group) for pk, points, group in
+                 Student.objects.filter(pk__in=students).values_list('id', 'exam_points', 'group')}
+        self.assertEqual(saved, {item['id']: (item['exam_points'], self.groups[1].pk) for item in data})
+        return len(queries)
+
+    def update_batches(self, rows: int) -> int:
+        # bulk_update делится на порции по ограничению количества параметров запроса БД (SQLite - 999)
+        return ceil(rows / connection.ops.bulk_batch_size(self.UPDATE_FIELDS, [None] * rows))
+
+    def test_query_count_independent_of_rows(self):
+        small = self.update(0, 10)
+        large = self.update(10, 1000)
+        self.assertEqual(large - self.update_batches(1000), small - self.update_batches(10))
@@ -43,15 +43,65 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Метрики запросов для /metrics (METRICS_*), первым - чтобы учитывать время остальных слоев
+    'project_lib.rest.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Учет запросов к БД и поиск N+1 (QUERY_BUDGET_*)
+    'project_lib.rest.middleware.QueryBudgetMiddleware',
+    # Сессия, CSRF, аутентификация и сообщения не применяются к STATELESS_API_PREFIXES
+    'project_lib.rest.middleware.ApiSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'project_lib.rest.middleware.ApiCsrfViewMiddleware',
+    'project_lib.rest.middleware.ApiAuthenticationMiddleware',
+    'project_lib.rest.middleware.ApiMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'project_lib.rest.middleware.SetGlobalRequestMiddleware',
 ]
 
+# API без состояния: аутентификация подписанным токеном без обращения к таблице сессий
+STATELESS_API_PREFIXES = ('/api/',)
+API_TOKEN_MAX_AGE = 60 * 60 * 12  # Срок жизни токена API в секундах (выпуск: manage.py issue_api_token)
+
+# Модули с отложенными сериалайзерами (lazy_serializer) для команды warm_serializers и WARM_SERIALIZERS_ON_LOAD
+SERIALIZER_WARMUP_MODULES = [
+    'apps.custom_auth.service.user_service.change_structure',
+]
+# Построить отложенные сериалайзеры при загрузке wsgi/asgi приложения (gunicorn --preload: в мастере до fork)
+WARM_SERIALIZERS_ON_LOAD = False
+# Допустимое время запуска проекта для команды profile_startup, мс (None - без проверки)
+STARTUP_BUDGET_MS = None
+
+# Бюджет запросов к БД на один запрос пользователя (QueryBudgetMiddleware), None - без ограничения.
+# Представление может задать свой бюджет атрибутом query_budget
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET = {'queries': None, 'db_time_ms': None, 'repeated': 10}
+QUERY_BUDGET_MODE = 'log'  # 'log' - предупреждение в журнал, 'raise' - исключение QueryBudgetExceeded
+QUERY_BUDGET_SERVER_TIMING = DEBUG
+
+# Метрики Prometheus (MetricsMiddleware, /metrics)
+METRICS_ENABLED = True
+METRICS_MAX_SERIES = 1000  # Предел количества серий в памяти процесса
+# Общий каталог для нескольких воркеров (очищать при перезапуске), None - метрики только текущего процесса
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5.0  # Период записи метрик процесса в METRICS_DIR, с
+METRICS_EXCLUDE_PATHS = ('/metrics',)
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')  # Адреса сборщика метрик, остальным /metrics доступен только is_staff
+# Профилирование вложенных полей динамических сериалайзеров (время по путям полей в метриках и Server-Timing)
+SERIALIZER_PROFILING = False
+SERIALIZER_PROFILING_HEADER = DEBUG
+SERIALIZER_PROFILING_TOP = 10  # Сколько самых медленных путей выводить в заголовок
+
+REST_FRAMEWORK = {
+    # Токен - для STATELESS_API_PREFIXES, сессия - для остальных представлений DRF (browsable API).
+    # К API сессия не применяется: ApiAuthenticationMiddleware не заполняет request.user
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'project_lib.rest.authentication.SignedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    # Стандартный обработчик ошибок DRF с учетом ошибок в метриках (http_exceptions_total)
+    'EXCEPTION_HANDLER': 'project_lib.rest.metrics.exception_handler',
+}
+
 ROOT_URLCONF = 'apps.urls'
 
 TEMPLATES = [
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 from ozon_service.Danger_data_api import views
+from project_lib.rest.metrics import metrics_view
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include('apps.Danger_data_api.urls'))
 
 ]
@@ -0,0 +1,81 @@
+"""
+Сравнение обычного to_representation динамического сериалайзера и режима fast
+Запуск из каталога core:
+    python -m benchmarks.fast_representation --rows 100 --children 10
+Данные строятся в памяти (без БД), поэтому замеряется только сериализация
+"""
+import argparse
+import os
+import timeit
+from datetime import datetime, timezone
+from uuid import uuid4
+
+SPEC = '__all__,user_user[__all__].group[id|name|course],teacher_user[id|department|is_lead_department]'
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+
+def make_users(rows: int, children: int) -> list:
+    """
+    Пользователи с заранее заполненным кешем prefetch_related
+    """
+    from apps.custom_auth.models import CustomUser, Student, StudyGroup, Teacher
+
+    group = StudyGroup(id=uuid4(), name='ПИ-101', course=1, type_education='magistracy', direction='ПИ')
+    users = []
+    for i in range(rows):
+        user = CustomUser(id=uuid4(), name=f'name{i}', surname=f'surname{i}', phone_number=f'+7900{i:07d}',
+                          gender='male', date_birth=datetime(2000, 1, 1, tzinfo=timezone.utc))
+        students = [
+            Student(id=uuid4(), user_id=user, group=group, is_headman=False, grant='classic', exam_points=j)
+            for j in range(children)
+        ]
+        teachers = [Teacher(id=uuid4(), user_id=user, groups=group, department='ИТ')]
+        user._prefetched_objects_cache = {'user_user': students, 'teacher_user': teachers}
+        users.append(user)
+    return users
+
+
+def run(rows: int, children: int, number: int) -> dict:
+    """
+    Замер сериализации списка в обычном и быстром режиме
+    :return: Время одной сериализации списка в секундах и ускорение
+    """
+    from apps.custom_auth.models import CustomUser
+    from project_lib.rest.serializers import DynamicSerializerModel
+
+    users = make_users(rows, children)
+    regular = DynamicSerializerModel(model=CustomUser, attrs=SPEC).build()
+    fast = DynamicSerializerModel(model=CustomUser, attrs=SPEC).build(fast=True)
+    assert regular(users, many=True).data == fast(users, many=True).data, 'Результаты сериализации различаются'
+
+    regular_time = min(timeit.repeat(lambda: regular(users, many=True).data, number=number, repeat=3)) / number
+    fast_time = min(timeit.repeat(lambda: fast(users, many=True).data, number=number, repeat=3)) / number
+    return {
+        'rows': rows,
+        'children': children,
+        'regular_sec': regular_time,
+        'fast_sec': fast_time,
+        'speedup': regular_time / fast_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100, help='Количество корневых записей')
+    parser.add_argument('--children', type=int, default=10, help='Количество вложенных записей на строку')
+    parser.add_argument('--number', type=int, default=10, help='Количество повторов в замере')
+    args = parser.parse_args()
+    setup_django()
+    result = run(args.rows, args.children, args.number)
+    print(f"rows={result['rows']} children={result['children']}: "
+          f"regular {result['regular_sec'] * 1000:.2f} ms, fast {result['fast_sec'] * 1000:.2f} ms, "
+          f"speedup x{result['speedup']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
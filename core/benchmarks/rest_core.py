@@ -0,0 +1,393 @@
+"""
+Замеры ядра REST: построение динамических сериалайзеров, сериализация вложенных списков,
+пагинация limit/offset и по курсору на разной глубине, действия CreateStructureUser.process()
+и массовое изменение записей. Данные генерируются детерминированно по --seed в SQLite.
+Запуск из каталога core:
+    python -m benchmarks.rest_core --output benchmark.json
+    python -m benchmarks.rest_core --compare benchmark.json --threshold 0.2
+    python -m benchmarks.rest_core --only pagination --rows 20000
+Результат сравнивается по медиане, при замедлении больше порога код возврата 1.
+Если какой-либо замер завершился ошибкой, код возврата тоже 1 (результаты остальных замеров сохраняются).
+Изменяющие данные замеры выполняются в транзакции с откатом.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+from uuid import UUID
+
+SPEC = '__all__,user_user[__all__].group[id|name|course],teacher_user[id|department|is_lead_department]'
+LIST_ROWS = (100, 1000, 10000)
+PAGE_DEPTHS = (0, 1000, 9900)
+PAGE_LIMIT = 100
+BULK_ROWS = 1000
+
+SURNAMES = ('Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов',
+            'Михайлов', 'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов')
+NAMES = ('Иван', 'Петр', 'Анна', 'Мария', 'Олег', 'Елена', 'Сергей', 'Ольга', 'Дмитрий', 'Ирина')
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+    from loguru import logger
+    # Журнал обработчиков не должен влиять на замеры
+    logger.disable('')
+
+
+class Benchmark:
+    """
+    Замер: функция одного прогона и количество прогонов в одном измерении
+    """
+
+    def __init__(self, name: str, func: Callable, number: int = 1) -> None:
+        self.name = name
+        self.func = func
+        self.number = number
+
+    def run(self, repeat: int) -> dict:
+        self.func()  # Прогрев: кеши классов сериалайзеров, планов и соединения
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(self.number):
+                self.func()
+            timings.append((time.perf_counter() - started) / self.number)
+        return {
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+            'repeat': repeat,
+            'number': self.number,
+        }
+
+
+class Dataset:
+    """
+    Детерминированные данные для замеров
+    """
+
+    def __init__(self, rows: int, children: int, seed: int) -> None:
+        self.rows = rows
+        self.children = children
+        self.random = random.Random(seed)
+        self.user_ids: List[UUID] = []
+        self.student_ids: List[UUID] = []
+        self.group_ids: List[UUID] = []
+
+    def uuid(self) -> UUID:
+        return UUID(int=self.random.getrandbits(128), version=4)
+
+    def seed(self) -> None:
+        from apps.custom_auth.models import CustomUser, Student, StudyGroup, Teacher, University
+
+        if CustomUser.objects.count() >= self.rows:
+            # Данные уже созданы (BENCHMARK_DB)
+            self.user_ids = list(CustomUser.objects.order_by('surname', 'id').values_list('id', flat=True))
+            self.student_ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+            self.group_ids = list(StudyGroup.objects.values_list('id', flat=True))
+            return
+        university = University.objects.create(id=self.uuid(), name='Университет', city='Москва')
+        groups = [StudyGroup(id=self.uuid(), university=university, name=f'ГР-{i:03d}', course=i % 6 + 1,
+                             type_education='undergradute', direction='Информатика') for i in range(20)]
+        StudyGroup.objects.bulk_create(groups)
+        users, students, teachers = [], [], []
+        for i in range(self.rows):
+            user = CustomUser(id=self.uuid(), name=self.random.choice(NAMES), surname=self.random.choice(SURNAMES),
+                              phone_number=f'+7900{i:07d}', gender=self.random.choice(('male', 'female')),
+                              date_birth=datetime(2000, 1, 1 + i % 28, tzinfo=timezone.utc))
+            users.append(user)
+            for _ in range(self.children):
+                students.append(Student(id=self.uuid(), user_id=user, group=self.random.choice(groups),
+                                        grant='classic', exam_points=self.random.randint(0, 100)))
+            if i % 10 == 0:
+                teachers.append(Teacher(id=self.uuid(), user_id=user, groups=self.random.choice(groups),
+                                        department='ИТ'))
+        CustomUser.objects.bulk_create(users, batch_size=1000)
+        Student.objects.bulk_create(students, batch_size=1000)
+        Teacher.objects.bulk_create(teachers, batch_size=1000)
+        self.user_ids = list(CustomUser.objects.order_by('surname', 'id').values_list('id', flat=True))
+        self.student_ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+        self.group_ids = [group.id for group in groups]
+
+
+def in_rollback(func: Callable) -> Callable:
+    """
+    Выполнить прогон в транзакции с откатом, чтобы данные не менялись между прогонами
+    """
+    from django.db import transaction
+
+    def run():
+        with transaction.atomic():
+            func()
+            transaction.set_rollback(True)
+
+    return run
+
+
+def serializer_benchmarks(data: Dataset) -> List[Benchmark]:
+    from rest_framework.serializers import BaseSerializer
+
+    from apps.custom_auth.models import CustomUser
+    from project_lib.rest.serializers import DynamicSerializerModel, parse_field_spec
+
+    def touch_fields(serializer) -> None:
+        # Поля и вложенные сериалайзеры создаются при первом чтении .fields
+        for field in serializer.fields.values():
+            child = getattr(field, 'child', field)
+            if isinstance(child, BaseSerializer):
+                touch_fields(child)
+
+    def cold():
+        parse_field_spec.cache_clear()
+        touch_fields(DynamicSerializerModel(model=CustomUser, attrs=SPEC).build(use_cache=False)())
+
+    def cached():
+        touch_fields(DynamicSerializerModel(model=CustomUser, attrs=SPEC).build()())
+
+    return [
+        Benchmark('serializer_build.cold', cold, number=20),
+        Benchmark('serializer_build.cached', cached, number=200),
+    ]
+
+
+def nested_list_benchmarks(data: Dataset) -> List[Benchmark]:
+    from apps.custom_auth.models import CustomUser
+    from project_lib.rest.serializers import DynamicSerializerModel
+
+    regular = DynamicSerializerModel(model=CustomUser, attrs=SPEC).build()
+    fast = DynamicSerializerModel(model=CustomUser, attrs=SPEC).build(fast=True)
+    queryset = regular.get_query_plan().apply(CustomUser.objects.order_by('surname', 'id'))
+    result = []
+    for rows in LIST_ROWS:
+        if rows > data.rows:
+            continue
+        for mode, serializer in (('regular', regular), ('fast', fast)):
+            result.append(Benchmark(f'nested_list.{mode}.{rows}',
+                                    lambda s=serializer, r=rows: s(queryset[:r], many=True).data))
+    return result
+
+
+def pagination_benchmarks(data: Dataset) -> List[Benchmark]:
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+
+    from apps.custom_auth.api.pagination import CustomUserCursorPagination
+    from apps.custom_auth.models import CustomUser
+    from project_lib.rest.pagination import LimitOffsetPagination
+
+    factory = RequestFactory()
+    queryset = CustomUser.objects.order_by('surname', 'id')
+    sort_field = CustomUser._meta.get_field('surname')
+    result = []
+    for depth in PAGE_DEPTHS:
+        if depth + PAGE_LIMIT > data.rows:
+            continue
+        offset_request = Request(factory.get('/', {'limit': PAGE_LIMIT, 'offset': depth}))
+        result.append(Benchmark(
+            f'pagination.limit_offset.{depth}',
+            lambda r=offset_request: LimitOffsetPagination().paginate_queryset(queryset, r)))
+
+        params = {'limit': PAGE_LIMIT}
+        if depth:
+            # Курсор на позицию последней записи предыдущей страницы
+            paginator = CustomUserCursorPagination()
+            paginator.request = Request(factory.get('/'))
+            instance = queryset[depth - 1]
+            link = paginator._make_link(paginator._get_position(instance, sort_field), paginator.NEXT)
+            params['cursor'] = parse_qs(urlparse(link).query)['cursor'][0]
+        cursor_request = Request(factory.get('/', params))
+        result.append(Benchmark(
+            f'pagination.cursor.{depth}',
+            lambda r=cursor_request: CustomUserCursorPagination().paginate_queryset(queryset, r)))
+    return result
+
+
+def builder_benchmarks(data: Dataset) -> List[Benchmark]:
+    from apps.custom_auth.models import Student
+    from apps.custom_auth.service.user_service.change_structure import CreateStructureUser
+
+    counter = iter(range(10 ** 9))
+    first_ids = [str(pk) for pk in data.user_ids[:100]]
+    group_id = str(data.group_ids[0])
+
+    def user_payload(**extra) -> dict:
+        number = next(counter)
+        return dict(name='Бенчмарк', surname='Тестов', phone_number=f'+7911{number:07d}', gender='male', **extra)
+
+    def process(payload: dict, process_type: str = CreateStructureUser.PROCESS_TYPE_POST):
+        return lambda: CreateStructureUser(payload() if callable(payload) else payload, process_type).process()
+
+    delete = CreateStructureUser.PROCESS_TYPE_DELETE
+    new_users = lambda: {'action_type': 'bulk_save_user', 'items': [user_payload() for _ in range(BULK_ROWS)]}
+    new_students = {'action_type': 'bulk_save_student', 'items': [
+        {'user_id': str(data.user_ids[i % len(data.user_ids)]), 'group': group_id, 'exam_points': i % 100,
+         'grant': 'classic'} for i in range(BULK_ROWS)]}
+    changed_students = {'action_type': 'bulk_save_student', 'items': [
+        {'id': str(pk), 'user_id': str(user_id), 'group': str(group), 'exam_points': i % 100, 'grant': 'classic'}
+        for i, (pk, user_id, group) in enumerate(
+            Student.objects.order_by('id').values_list('id', 'user_id', 'group')[:BULK_ROWS])]}
+    cases = {
+        'save_user.create': lambda: {'action_type': 'save_user', 'data_user': user_payload()},
+        'save_user.update': lambda: {'action_type': 'save_user', 'data_user': user_payload(id=first_ids[0])},
+        'delete_user.dry_run': ({'action_type': 'delete_user', 'ids': first_ids, 'dry_run': True}, delete),
+        'delete_user.cascade': ({'action_type': 'delete_user', 'ids': first_ids}, delete),
+        'delete_user.soft': ({'action_type': 'delete_user', 'ids': first_ids, 'soft': True}, delete),
+        f'bulk_save_user.create.{BULK_ROWS}': new_users,
+        f'bulk_save_student.create.{BULK_ROWS}': new_students,
+        f'bulk_save_student.update.{BULK_ROWS}': changed_students,
+    }
+    result = []
+    for name, case in cases.items():
+        payload, process_type = case if isinstance(case, tuple) else (case, CreateStructureUser.PROCESS_TYPE_POST)
+        result.append(Benchmark(f'builder.{name}', in_rollback(process(payload, process_type))))
+    return result
+
+
+def bulk_update_benchmarks(data: Dataset) -> List[Benchmark]:
+    from rest_framework import serializers
+    from rest_framework_bulk import BulkSerializerMixin
+
+    from apps.custom_auth.models import Student
+    from project_lib.rest.serializers.bulk import BulkListSerializerFixUUID
+
+    class StudentBulkSerializer(BulkSerializerMixin, serializers.ModelSerializer):
+        class Meta:
+            model = Student
+            fields = '__all__'
+            list_serializer_class = BulkListSerializerFixUUID
+            extra_kwargs = {'id': {'read_only': False, 'validators': []}}
+
+    class Request:
+        method = 'PATCH'
+
+    class View:
+        request = Request()
+
+    group_ids = [str(pk) for pk in data.group_ids]
+    rows = [{'id': str(pk), 'exam_points': i % 100, 'group': group_ids[i % len(group_ids)]}
+            for i, pk in enumerate(data.student_ids[:BULK_ROWS])]
+
+    def update():
+        serializer = StudentBulkSerializer(Student.objects.all(), data=rows, many=True, partial=True,
+                                           context={'view': View()})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    return [Benchmark(f'bulk_update.fix_uuid.{BULK_ROWS}', in_rollback(update))]
+
+
+GROUPS = {
+    'serializer_build': serializer_benchmarks,
+    'nested_list': nested_list_benchmarks,
+    'pagination': pagination_benchmarks,
+    'builder': builder_benchmarks,
+    'bulk_update': bulk_update_benchmarks,
+}
+
+
+def run(data: Dataset, repeat: int, only: Optional[str] = None) -> Dict[str, dict]:
+    results = {}
+    for group, factory in GROUPS.items():
+        try:
+            benchmarks = factory(data)
+        except Exception as e:
+            results[group] = {'error': f'{type(e).__name__}: {e}'[:500]}
+            print(format_result(group, results[group]), file=sys.stderr)
+            continue
+        for benchmark in benchmarks:
+            if only and only not in benchmark.name:
+                continue
+            try:
+                results[benchmark.name] = benchmark.run(repeat)
+            except Exception as e:
+                # Сломанное действие не останавливает остальные замеры
+                results[benchmark.name] = {'error': f'{type(e).__name__}: {e}'[:500]}
+            print(format_result(benchmark.name, results[benchmark.name]), file=sys.stderr)
+    return results
+
+
+def format_result(name: str, result: dict) -> str:
+    if 'error' in result:
+        return f'{name:<45} ошибка: {result["error"]}'
+    return f'{name:<45} median {result["median"] * 1000:>10.3f} ms  min {result["min"] * 1000:>10.3f} ms'
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """
+    Замеры медленнее базовых больше чем на threshold (доля)
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or 'median' not in base or 'median' not in result:
+            continue
+        ratio = result['median'] / base['median'] if base['median'] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f'{name}: {base["median"] * 1000:.3f} ms -> {result["median"] * 1000:.3f} ms '
+                               f'(x{ratio:.2f})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=max(LIST_ROWS), help='Количество пользователей')
+    parser.add_argument('--children', type=int, default=3, help='Количество студентов на пользователя')
+    parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора данных')
+    parser.add_argument('--repeat', type=int, default=5, help='Количество измерений каждого замера')
+    parser.add_argument('--only', help='Выполнить замеры, имя которых содержит строку')
+    parser.add_argument('--output', help='Файл для результатов в формате JSON')
+    parser.add_argument('--compare', help='Файл с базовыми результатами для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Допустимое замедление медианы (доля)')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command('migrate', verbosity=0)
+    data = Dataset(args.rows, args.children, args.seed)
+    data.seed()
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': connection.vendor,
+            'rows': args.rows,
+            'children': args.children,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': run(data, args.repeat, args.only),
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    failed = sorted(name for name, result in report['results'].items() if 'error' in result)
+    if failed:
+        print(f'Замеры с ошибкой: {", ".join(failed)}', file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(report['results'], baseline, args.threshold)
+        for line in regressions:
+            print(f'Замедление {line}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f'Замедлений больше {args.threshold:.0%} нет', file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""
+Настройки для замеров производительности
+База SQLite: в памяти или файл из переменной окружения BENCHMARK_DB (данные сохраняются между запусками)
+"""
+import os
+
+from apps.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver']
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'django.contrib.auth',
+    'apps.custom_auth',
+    'apps.LearnMaterials',
+]
+MIDDLEWARE = []
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DB', ':memory:'),
+    }
+}
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Замеры без учета запросов и метрик
+QUERY_BUDGET_ENABLED = False
+METRICS_ENABLED = False
+SERIALIZER_PROFILING = False
@@ -0,0 +1,77 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    """
+    QuerySet моделей с мягким удалением (колонка deleted_at)
+    Пример:
+        CustomUser.objects.undeleted()  # Действующие записи
+        CustomUser.objects.deleted()  # Удаленные записи
+        CustomUser.objects.filter(pk__in=ids).soft_delete()  # Один UPDATE
+    """
+
+    def undeleted(self) -> 'SoftDeleteQuerySet':
+        """
+        Не удаленные записи
+        """
+        return self.filter(deleted_at__isnull=True)
+
+    def deleted(self) -> 'SoftDeleteQuerySet':
+        """
+        Удаленные записи
+        """
+        return self.filter(deleted_at__isnull=False)
+
+    def soft_delete(self) -> int:
+        """
+        Пометить записи удаленными одним запросом UPDATE
+        :return: Количество помеченных записей
+        """
+        return self.filter(deleted_at__isnull=True).update(deleted_at=timezone.now())
+
+    def restore(self) -> int:
+        """
+        Восстановить удаленные записи одним запросом UPDATE
+        :return: Количество восстановленных записей
+        """
+        return self.filter(deleted_at__isnull=False).update(deleted_at=None)
+
+
+SoftDeleteManager = models.Manager.from_queryset(SoftDeleteQuerySet, 'SoftDeleteManager')
+
+
+class SoftDeleteModel(models.Model):
+    """
+    Абстрактная модель с мягким удалением
+    В наследнике рекомендуется частичный индекс по не удаленным записям для списков:
+        class Meta:
+            indexes = [
+                models.Index(fields=['id'], condition=Q(deleted_at__isnull=True), name='model_undeleted_idx'),
+            ]
+    """
+    deleted_at = models.DateTimeField(db_column='deleted_at', verbose_name='Дата удаления', null=True, blank=True,
+                                      editable=False)
+
+    objects = SoftDeleteManager()
+
+    class Meta:
+        abstract = True
+
+    @property
+    def is_deleted(self) -> bool:
+        return self.deleted_at is not None
+
+    def soft_delete(self) -> None:
+        """
+        Пометить запись удаленной
+        """
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'])
+
+    def restore(self) -> None:
+        """
+        Восстановить удаленную запись
+        """
+        self.deleted_at = None
+        self.save(update_fields=['deleted_at'])
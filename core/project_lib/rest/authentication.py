@@ -0,0 +1,70 @@
+import typing
+
+from django.conf import settings
+from django.core import signing
+from rest_framework import authentication, exceptions
+
+TOKEN_SALT = 'project_lib.rest.authentication.SignedTokenAuthentication'
+
+
+class TokenUser:
+    """
+    Пользователь восстановленный из подписанного токена без обращения к БД
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, claims: dict) -> None:
+        """
+        :param claims: Данные токена. Ключ uid - идентификатор пользователя
+        """
+        self.claims = claims
+        self.id = self.pk = claims['uid']
+
+    def __str__(self) -> str:
+        return str(self.id)
+
+
+def make_token(user_id, **claims) -> str:
+    """
+    Выпустить подписанный токен API
+    Токен содержит все нужные для аутентификации данные и проверяется только по подписи и сроку жизни
+    :param user_id: Идентификатор пользователя
+    :param claims: Дополнительные данные токена (например роли)
+    """
+    return signing.dumps({'uid': str(user_id), **claims}, salt=TOKEN_SALT, compress=True)
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Аутентификация API по подписанному токену: Authorization: Token <token>
+    Токен проверяется по подписи (SECRET_KEY) и сроку жизни API_TOKEN_MAX_AGE (секунды),
+    запросов к БД и к таблице сессий не выполняется.
+    Токен выпускается функцией make_token (команда issue_api_token)
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request) -> typing.Optional[typing.Tuple[TokenUser, str]]:
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Некорректный заголовок токена.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Некорректный заголовок токена.')
+        max_age = getattr(settings, 'API_TOKEN_MAX_AGE', None)
+        try:
+            claims = signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed('Срок действия токена истек.')
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed('Недействительный токен.')
+        if not isinstance(claims, dict) or 'uid' not in claims:
+            raise exceptions.AuthenticationFailed('Недействительный токен.')
+        return TokenUser(claims), token
+
+    def authenticate_header(self, request) -> str:
+        return self.keyword
@@ -0,0 +1,118 @@
+import hashlib
+from collections import namedtuple
+from typing import Optional
+
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+
+CountResult = namedtuple('CountResult', ['value', 'exact'])
+
+
+def estimate_table_rows(model, using: str = 'default') -> Optional[int]:
+    """
+    Оценка количества строк таблицы модели по статистике БД без обхода таблицы
+    PostgreSQL - pg_class.reltuples (обновляется VACUUM/ANALYZE), SQLite - sqlite_stat1 (после ANALYZE)
+    :return: Оценка или None если статистика недоступна
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)'
+        params = [connection.ops.quote_name(table)]
+    elif connection.vendor == 'sqlite':
+        # Строка на каждый индекс, первое число stat - количество строк индекса.
+        # У частичного индекса оно меньше количества строк таблицы, поэтому берется максимум
+        sql = 'SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s'
+        params = [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        # Например sqlite_stat1 отсутствует пока не выполнен ANALYZE
+        return None
+    if not row or row[0] is None:
+        return None
+    try:
+        value = int(str(row[0]).split()[0])
+    except (TypeError, ValueError):
+        return None
+    # reltuples = -1 для таблицы без статистики
+    return value if value >= 0 else None
+
+
+class CountStrategy:
+    """
+    Получение общего количества записей для пагинации.
+    Всегда выполняется SQL COUNT (без загрузки записей), дополнительно:
+        estimate - для QuerySet без фильтров брать оценку из статистики БД, если она не меньше estimate_threshold
+        cache_timeout - кешировать точный COUNT на указанное количество секунд.
+                        Ключ кеша - SQL запроса с параметрами, одинаковые фильтры дают один ключ
+    Пример:
+        CountStrategy(estimate=True, estimate_threshold=100000, cache_timeout=30).count(queryset)
+        # CountResult(value=1250000, exact=False)
+    """
+    cache_alias = 'default'
+    cache_prefix = 'project_lib:count:'
+
+    def __init__(self, estimate: bool = False, estimate_threshold: int = 10000, cache_timeout: int = 0) -> None:
+        """
+        :param estimate: Разрешить оценку количества для таблиц без фильтров
+        :param estimate_threshold: Оценка используется только если она не меньше порога,
+                                   небольшие таблицы считаются точно
+        :param cache_timeout: Время жизни закешированного количества в секундах. 0 - без кеширования
+        """
+        self.estimate = estimate
+        self.estimate_threshold = estimate_threshold
+        self.cache_timeout = cache_timeout
+
+    def count(self, queryset) -> CountResult:
+        """
+        Количество записей
+        :param queryset: QuerySet или список
+        """
+        total_count = getattr(queryset, 'total_count', None)
+        if callable(total_count):
+            return CountResult(total_count(), True)
+        if not isinstance(queryset, QuerySet):
+            return CountResult(len(queryset), True)
+        if queryset._result_cache is not None:
+            return CountResult(len(queryset._result_cache), True)
+        if self.estimate and self.is_unfiltered(queryset):
+            estimate = estimate_table_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return CountResult(estimate, False)
+        if not self.cache_timeout:
+            return CountResult(queryset.count(), True)
+        key = self.make_cache_key(queryset)
+        if key is None:
+            return CountResult(queryset.count(), True)
+        cache = caches[self.cache_alias]
+        value = cache.get(key)
+        if value is None:
+            value = queryset.count()
+            cache.set(key, value, self.cache_timeout)
+        return CountResult(value, True)
+
+    @staticmethod
+    def is_unfiltered(queryset: QuerySet) -> bool:
+        """
+        QuerySet выбирает всю таблицу модели (количество совпадает с количеством строк таблицы)
+        """
+        query = queryset.query
+        return not query.where and not query.is_sliced and not query.distinct and not query.combinator
+
+    def make_cache_key(self, queryset: QuerySet) -> Optional[str]:
+        """
+        Ключ кеша по SQL запроса без сортировки
+        :return: Ключ или None если запрос не удалось скомпилировать
+        """
+        try:
+            sql, params = queryset.order_by().query.sql_with_params()
+        except Exception:
+            return None
+        raw = f'{queryset.db}:{queryset.model._meta.label}:{sql}:{params!r}'
+        return self.cache_prefix + hashlib.md5(raw.encode()).hexdigest()
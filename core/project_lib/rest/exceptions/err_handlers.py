@@ -7,6 +7,7 @@ from rest_framework.exceptions import ErrorDetail
 from rest_framework.utils.serializer_helpers import ReturnList
 from rest_framework.views import set_rollback
 
+from ..metrics import record_exception
 from .errors import *
 
 
@@ -32,6 +33,8 @@ def exception_handler(exc: ApiException, context: dict):
     :param context: Контекст запроса
     :return:
     """
+    # Ошибка учитывается в метриках по классу исключения (http_exceptions_total)
+    record_exception(exc)
     # В случае, когда detail представляет из себя список - объединяем его
     if hasattr(exc, 'detail') and isinstance(exc.detail, ReturnList):
         strings = _get_recursive_error_strings(exc.detail)
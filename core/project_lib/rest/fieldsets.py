@@ -0,0 +1,103 @@
+from collections import OrderedDict
+
+from rest_framework.permissions import SAFE_METHODS
+
+from .exceptions import BadRequestError
+from .query_plan import QuerySetPlanMixin, get_relation_field
+from .serializers.meta import DynamicSerializerModel
+from .serializers.spec import ALL, FieldSpec, FieldSpecSyntaxError, parse_field_spec
+
+
+# noinspection PyUnresolvedReferences
+class SparseFieldsetMixin(QuerySetPlanMixin):
+    """
+    Примесь к представлению позволяющая клиенту выбрать возвращаемые поля параметром запроса ?fields=
+    Синтаксис параметра как у attrs DynamicSerializerModel:
+        ?fields=id,name,user_user[id|group]
+    Для выбранных полей берется закешированный динамический сериалайзер,
+    а QuerySet получает соответствующий план выборки (select_related/prefetch_related/only).
+
+    Запрошенные поля проверяются по белому списку sparse_fields_allowed (тот же синтаксис)
+    и ограничению вложенности sparse_fields_max_depth.
+    Пример:
+        class CustomUserViewSet(SparseFieldsetMixin, ModelViewSet):
+            queryset = models.CustomUser.objects.all()
+            serializer_class = serializers.CustomUserSerializer
+            sparse_fields_allowed = '__all__,user_user[id|group|is_headman]'
+            sparse_fields_max_depth = 2
+    """
+    fields_query_param = 'fields'
+    sparse_fields_allowed = ALL  # Белый список полей
+    sparse_fields_max_depth = 2  # Максимальная вложенность запрашиваемых полей
+
+    def get_serializer_class(self):
+        requested_fields = self.get_requested_fields()
+        if not requested_fields:
+            return super().get_serializer_class()
+        try:
+            spec = parse_field_spec(requested_fields)
+        except FieldSpecSyntaxError as e:
+            raise BadRequestError({
+                '_detail': f'Ошибка в параметре {self.fields_query_param} (позиция {e.position}): {e.message}.',
+                'position': e.position,
+            })
+        self.check_requested_fields(spec)
+        return DynamicSerializerModel(model=self.get_sparse_model(), attrs=requested_fields).build()
+
+    def get_requested_fields(self) -> str:
+        """
+        Поля запрошенные клиентом. Применяются только при чтении
+        """
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return ''
+        return request.query_params.get(self.fields_query_param, '').strip()
+
+    def get_sparse_model(self):
+        """
+        Модель для которой строится сериалайзер
+        """
+        return self.queryset.model
+
+    def check_requested_fields(self, spec: FieldSpec) -> None:
+        """
+        Проверка запрошенных полей по белому списку и глубине вложенности
+        :param spec: Разобранные запрошенные поля
+        """
+        if spec.depth > self.sparse_fields_max_depth:
+            raise BadRequestError({
+                '_detail': f'Превышена допустимая вложенность полей в параметре {self.fields_query_param}.',
+                'max_depth': self.sparse_fields_max_depth,
+            })
+        self._check_node(self.get_sparse_model(), spec, parse_field_spec(self.sparse_fields_allowed), path='')
+
+    def _check_node(self, model, spec: FieldSpec, allowed: FieldSpec, path: str):
+        """
+        Рекурсивная проверка узла запрошенных полей
+        :param model: Модель узла
+        :param spec: Запрошенный узел
+        :param allowed: Разрешенный узел
+        :param path: Путь узла для сообщения об ошибке
+        """
+        allowed_names = set(allowed.fields)
+        if ALL in allowed_names:
+            allowed_names.update(f.name for f in model._meta.concrete_fields)
+        for name in spec.fields:
+            if name not in allowed_names:
+                self._raise_not_allowed(path, name, allowed_names)
+        for name, child in spec.children:
+            allowed_child = allowed.get_child(name)
+            if allowed_child is None:
+                self._raise_not_allowed(path, f'{name}[...]', [n for n, _ in allowed.children])
+            field = get_relation_field(model, name)
+            if field is None:
+                # Неизвестное поле, ошибку о нем выдаст сериалайзер
+                continue
+            self._check_node(field.related_model, child, allowed_child, path=f'{path}{name}.')
+
+    def _raise_not_allowed(self, path, name, allowed_names):
+        error_message = OrderedDict()
+        error_message['_detail'] = f'Поле `{path}{name}` недоступно для выборки ' \
+                                   f'в параметре {self.fields_query_param}.'
+        error_message['allow_field_names'] = sorted(allowed_names)
+        raise BadRequestError(error_message)
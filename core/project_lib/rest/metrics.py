@@ -0,0 +1,344 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from loguru import logger
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Секунды
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)  # Байты
+
+# Имя: (тип, описание, границы корзин гистограммы)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Время обработки запроса', TIME_BUCKETS),
+    'http_request_db_seconds': ('histogram', 'Время запросов к БД за запрос', TIME_BUCKETS),
+    'http_request_serialization_seconds': ('histogram', 'Время сериализации и отрисовки ответа', TIME_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Размер тела ответа', SIZE_BUCKETS),
+    'http_requests_total': ('counter', 'Количество запросов', None),
+    'http_exceptions_total': ('counter', 'Количество ошибок по классам исключений', None),
+    'serializer_field_seconds': ('histogram', 'Время представления вложенного поля сериалайзера за запрос '
+                                              '(SERIALIZER_PROFILING)', TIME_BUCKETS),
+    'serializer_field_db_seconds': ('histogram', 'Время запросов к БД выполненных вложенным полем за запрос '
+                                                 '(SERIALIZER_PROFILING)', TIME_BUCKETS),
+}
+OVERFLOW_VIEW = '__overflow__'  # Представление для серий сверх METRICS_MAX_SERIES
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами: память не зависит от количества наблюдений
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Последняя корзина +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts: List[int], total: float, count: int) -> None:
+        for index, value in enumerate(counts):
+            self.counts[index] += value
+        self.sum += total
+        self.count += count
+
+
+class MetricsRegistry:
+    """
+    Хранилище метрик процесса.
+    Количество серий (сочетаний меток) ограничено max_series, новые серии сверх лимита
+    учитываются с меткой view="__overflow__".
+    При заданном directory снимок метрик периодически записывается в файл процесса,
+    /metrics суммирует файлы всех рабочих процессов (gunicorn/uwsgi с несколькими воркерами).
+    Каталог нужно очищать при перезапуске сервиса, иначе счетчики завершенных процессов остаются в сумме
+    """
+
+    def __init__(self, max_series: int = 1000, directory: str = None, flush_interval: float = 5.0) -> None:
+        self.max_series = max_series
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _reset(self) -> None:
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_settings(cls) -> 'MetricsRegistry':
+        return cls(
+            max_series=getattr(settings, 'METRICS_MAX_SERIES', 1000),
+            directory=getattr(settings, 'METRICS_DIR', None),
+            flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0),
+        )
+
+    def _key(self, name: str, labels: dict, store: dict) -> Tuple[str, Labels]:
+        key = (name, tuple(sorted(labels.items())))
+        if key not in store and len(self.histograms) + len(self.counters) >= self.max_series:
+            key = (name, tuple(sorted({**labels, 'view': OVERFLOW_VIEW}.items())))
+        return key
+
+    def observe(self, name: str, labels: dict, value: float) -> None:
+        with self._lock:
+            key = self._key(name, labels, self.histograms)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def inc(self, name: str, labels: dict, value: float = 1) -> None:
+        with self._lock:
+            key = self._key(name, labels, self.counters)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'histograms': [[name, list(labels), h.counts, h.sum, h.count]
+                               for (name, labels), h in self.histograms.items()],
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+            }
+
+    # Файловое хранилище для нескольких процессов
+
+    def _path(self, pid: int = None) -> str:
+        return os.path.join(self.directory, f'metrics-{pid or os.getpid()}.json')
+
+    def flush(self) -> None:
+        """
+        Записать снимок метрик процесса в файл (атомарно через переименование)
+        """
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump(self.snapshot(), file)
+            os.replace(temp_path, self._path())
+        except OSError as e:
+            logger.warning(f'Не удалось записать метрики в {self.directory}: {e}')
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def maybe_flush(self) -> None:
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def collect(self) -> 'MetricsRegistry':
+        """
+        Метрики всех процессов: текущий процесс из памяти, остальные из файлов
+        """
+        if not self.directory:
+            return self
+        merged = MetricsRegistry()
+        snapshots = [self.snapshot()]
+        own_path = self._path()
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            if path == own_path:
+                continue
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                # Файл процесса удален или записывается
+                continue
+        for snapshot in snapshots:
+            for name, labels, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                histogram = merged.histograms.get(key)
+                if histogram is None:
+                    histogram = merged.histograms[key] = Histogram(METRICS[name][2])
+                histogram.merge(counts, total, count)
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged.counters[key] = merged.counters.get(key, 0) + value
+        return merged
+
+    def render(self) -> str:
+        """
+        Метрики в текстовом формате Prometheus
+        """
+        lines = []
+        for name, (kind, description, _) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'histogram':
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(labels, le=bound)} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+            else:
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, **extra) -> str:
+    items = [*labels, *extra.items()]
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Хранилище метрик процесса (создается при первом обращении по настройкам)
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry.from_settings()
+                atexit.register(_registry.flush)
+                if hasattr(os, 'register_at_fork'):
+                    # Воркер после fork начинает с пустыми метриками и пишет в свой файл
+                    os.register_at_fork(after_in_child=_registry._reset)
+    return _registry
+
+
+class FieldProfile:
+    """
+    Накопленное за запрос время представления вложенного поля сериалайзера по его пути
+    Время включает вложенные поля и запросы к БД выполненные при их чтении (db)
+    """
+    __slots__ = ('seconds', 'db_seconds', 'calls')
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.calls = 0
+
+    @property
+    def self_seconds(self) -> float:
+        """
+        Время без запросов к БД
+        """
+        return self.seconds - self.db_seconds
+
+
+class RequestMetrics:
+    """
+    Данные одного запроса пользователя для метрик
+    """
+    __slots__ = ('serialization', 'serializing', 'exception', 'render_started', 'fields')
+
+    def __init__(self, profile_fields: bool = False) -> None:
+        self.serialization = 0.0  # Секунды
+        self.serializing = False
+        self.exception: Optional[str] = None
+        self.render_started: Optional[float] = None
+        # Профиль вложенных полей по путям, None - профилирование выключено
+        self.fields: Optional[Dict[Tuple[str, ...], FieldProfile]] = {} if profile_fields else None
+
+
+_request_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar('request_metrics', default=None)
+
+
+def start_request_metrics(profile_fields: bool = False) -> tuple:
+    """
+    :param profile_fields: Профилировать вложенные поля сериалайзеров (SERIALIZER_PROFILING)
+    """
+    metrics = RequestMetrics(profile_fields)
+    return metrics, _request_metrics.set(metrics)
+
+
+def get_field_profile() -> Optional[Dict[Tuple[str, ...], FieldProfile]]:
+    """
+    Профиль вложенных полей текущего запроса или None, если профилирование выключено
+    """
+    metrics = _request_metrics.get()
+    return None if metrics is None else metrics.fields
+
+
+def stop_request_metrics(token) -> None:
+    _request_metrics.reset(token)
+
+
+def start_serialization() -> Optional[float]:
+    """
+    Начало сериализации верхнего уровня
+    :return: Время начала или None, если метрики не собираются или сериализация уже учитывается
+    """
+    metrics = _request_metrics.get()
+    if metrics is None or metrics.serializing:
+        return None
+    metrics.serializing = True
+    return time.perf_counter()
+
+
+def stop_serialization(started: Optional[float]) -> None:
+    if started is None:
+        return
+    metrics = _request_metrics.get()
+    metrics.serializing = False
+    metrics.serialization += time.perf_counter() - started
+
+
+def record_exception(exc: Exception) -> None:
+    """
+    Учесть ошибку запроса (вызывается из exception_handler и MetricsMiddleware)
+    """
+    metrics = _request_metrics.get()
+    if metrics is not None and metrics.exception is None:
+        metrics.exception = type(exc).__name__
+
+
+def exception_handler(exc: Exception, context: dict):
+    """
+    Обработчик ошибок DRF (REST_FRAMEWORK['EXCEPTION_HANDLER']): ошибка учитывается в http_exceptions_total,
+    ответ формирует стандартный обработчик DRF
+    """
+    from rest_framework.views import exception_handler as drf_exception_handler
+
+    record_exception(exc)
+    return drf_exception_handler(exc, context)
+
+
+def metrics_view(request):
+    """
+    Метрики в формате Prometheus (text/plain; version=0.0.4)
+    Доступны с адресов METRICS_ALLOWED_IPS и сотрудникам (is_staff)
+    """
+    user = getattr(request, 'user', None)
+    if (request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+            and not (user is not None and user.is_staff)):
+        raise PermissionDenied
+    registry = get_registry()
+    registry.flush()
+    return HttpResponse(registry.collect().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,29 +1,288 @@
-from threading import current_thread
-
+import asyncio
+import time
 import typing
-from django.core.handlers.wsgi import WSGIRequest
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpRequest
+from django.middleware.csrf import CsrfViewMiddleware
 from django.utils.deprecation import MiddlewareMixin
+from loguru import logger
 
-REQUESTS = {}
+from . import metrics
+from .query_budget import QueryBudget, QueryBudgetExceeded, get_view_budget, start_query_stats, stop_query_stats
+from .responses import add_server_timing
 
+# Текущий запрос. Контекст отдельный для каждого потока и каждой asyncio задачи,
+# поэтому запросы не пересекаются и под ASGI, когда несколько запросов обрабатываются в одном потоке
+_current_request: ContextVar[typing.Optional[HttpRequest]] = ContextVar('current_request', default=None)
 
-def get_current_request() -> typing.Union[WSGIRequest, None]:
+
+def get_current_request() -> typing.Union[HttpRequest, None]:
     """
     Возвращает текущий запрос пользователя
     """
-    thread = current_thread()
-    if thread not in REQUESTS:
-        return None
-    return REQUESTS[thread]
+    return _current_request.get()
 
 
 class SetGlobalRequestMiddleware(MiddlewareMixin):
     """
     Промежуточный слой сохраняющий текущий запрос пользователя
-    Запись текущего запроса(request)
+    Запись текущего запроса(request) на время его обработки, после ответа значение сбрасывается.
+    Работает в синхронном (WSGI) и асинхронном (ASGI) стеке промежуточных слоев
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _current_request.set(request)
+        try:
+            return super().__call__(request)
+        finally:
+            _current_request.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            return await super().__acall__(request)
+        finally:
+            _current_request.reset(token)
+
+
+def is_stateless_api_request(request) -> bool:
+    """
+    Запрос к API без состояния (без сессии, CSRF и сообщений)
+    Префиксы путей задаются настройкой STATELESS_API_PREFIXES (по умолчанию /api/)
+    """
+    prefixes = tuple(getattr(settings, 'STATELESS_API_PREFIXES', ('/api/',)))
+    return bool(prefixes) and request.path_info.startswith(prefixes)
+
+
+class SkipForStatelessApiMixin:
+    """
+    Пропуск стандартного промежуточного слоя для запросов к API без состояния.
+    API аутентифицируется подписанным токеном (SignedTokenAuthentication),
+    поэтому сессия не читается и не сохраняется, cookie не отправляется
     """
 
     def process_request(self, request):
-        if hasattr(request, 'session'):
-            request.session.clear()
-        REQUESTS[current_thread()] = request
+        handler = getattr(super(), 'process_request', None)
+        if handler is None or is_stateless_api_request(request):
+            return None
+        return handler(request)
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        handler = getattr(super(), 'process_view', None)
+        if handler is None or is_stateless_api_request(request):
+            return None
+        return handler(request, callback, callback_args, callback_kwargs)
+
+    def process_response(self, request, response):
+        handler = getattr(super(), 'process_response', None)
+        if handler is None or is_stateless_api_request(request):
+            return response
+        return handler(request, response)
+
+
+class ApiSessionMiddleware(SkipForStatelessApiMixin, SessionMiddleware):
+    pass
+
+
+class ApiCsrfViewMiddleware(SkipForStatelessApiMixin, CsrfViewMiddleware):
+    pass
+
+
+class ApiAuthenticationMiddleware(SkipForStatelessApiMixin, AuthenticationMiddleware):
+    pass
+
+
+class ApiMessageMiddleware(SkipForStatelessApiMixin, MessageMiddleware):
+    pass
+
+
+class QueryBudgetMiddleware(MiddlewareMixin):
+    """
+    Учет запросов к БД для каждого запроса пользователя: количество, суммарное время,
+    повторяющиеся запросы одной формы (N+1) с путем поля сериалайзера, который их вызвал.
+
+    Бюджет задается у представления (атрибут query_budget = QueryBudget(...) или декоратор query_budget),
+    по умолчанию - настройкой QUERY_BUDGET = {'queries': ..., 'db_time_ms': ..., 'repeated': ...}.
+    При превышении: QUERY_BUDGET_MODE = 'log' - предупреждение в журнал,
+    'raise' - исключение QueryBudgetExceeded (для тестов).
+    QUERY_BUDGET_SERVER_TIMING = True добавляет значения в заголовок Server-Timing.
+    Включается настройкой QUERY_BUDGET_ENABLED (по умолчанию при DEBUG).
+
+    Запросы потоковых ответов (StreamingHttpResponse) выполняются после ответа и не учитываются
+    """
+    report_limit = 5  # Сколько повторяющихся запросов выводить в журнал
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.default_budget = QueryBudget(**getattr(settings, 'QUERY_BUDGET', {}))
+        self.mode = getattr(settings, 'QUERY_BUDGET_MODE', 'log')
+        self.server_timing = getattr(settings, 'QUERY_BUDGET_SERVER_TIMING', False)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        request.query_stats, token = start_query_stats()
+        try:
+            return super().__call__(request)
+        finally:
+            stop_query_stats(token)
+
+    async def __acall__(self, request):
+        request.query_stats, token = start_query_stats()
+        try:
+            return await super().__acall__(request)
+        finally:
+            stop_query_stats(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_view_budget(view_func)
+        return None
+
+    def process_response(self, request, response):
+        stats = getattr(request, 'query_stats', None)
+        if stats is None:
+            return response
+        if self.server_timing:
+            add_server_timing(response, 'db', stats.duration, f'{stats.count} queries')
+            add_server_timing(response, 'db-repeated', description=f'{stats.max_repeated} max')
+        budget = getattr(request, 'query_budget', None) or self.default_budget
+        violations = budget.violations(stats)
+        if violations:
+            self.report(request, stats, violations)
+        return response
+
+    def report(self, request, stats, violations: typing.List[str]) -> None:
+        repeated = [s.as_dict() for s in stats.repeated()[:self.report_limit]]
+        message = f'Превышен бюджет запросов {request.method} {request.path}: {", ".join(violations)}'
+        if self.mode == 'raise':
+            raise QueryBudgetExceeded(f'{message}. Повторы: {repeated}', stats)
+        logger.warning(message)
+        for signature in repeated:
+            logger.warning(f'  {signature["count"]} x {signature["duration"]} мс {signature["paths"]}: '
+                           f'{signature["sql"]}')
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Метрики запросов по представлениям и методам: время обработки, время БД, время сериализации
+    и отрисовки ответа, размер ответа, количество запросов и ошибок по классам исключений.
+    Метрики отдаются представлением project_lib.rest.metrics.metrics_view в формате Prometheus.
+    Настройки: METRICS_ENABLED, METRICS_MAX_SERIES, METRICS_DIR (общий каталог воркеров),
+    METRICS_FLUSH_INTERVAL, METRICS_EXCLUDE_PATHS.
+
+    SERIALIZER_PROFILING = True включает профилирование вложенных полей динамических сериалайзеров:
+    время представления и время БД по путям полей (serializer_field_seconds, serializer_field_db_seconds),
+    SERIALIZER_PROFILING_HEADER добавляет SERIALIZER_PROFILING_TOP самых медленных путей в Server-Timing.
+    Должен быть первым в MIDDLEWARE, чтобы время обработки включало остальные промежуточные слои
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.registry = metrics.get_registry()
+        self.exclude_paths = tuple(getattr(settings, 'METRICS_EXCLUDE_PATHS', ('/metrics',)))
+        self.profile_fields = getattr(settings, 'SERIALIZER_PROFILING', False)
+        self.profile_header = getattr(settings, 'SERIALIZER_PROFILING_HEADER', settings.DEBUG)
+        self.profile_top = getattr(settings, 'SERIALIZER_PROFILING_TOP', 10)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if request.path_info.startswith(self.exclude_paths):
+            return super().__call__(request)
+        started, tokens = self.begin(request)
+        response = None
+        try:
+            response = super().__call__(request)
+            return response
+        finally:
+            self.end(request, response, started, tokens)
+
+    async def __acall__(self, request):
+        if request.path_info.startswith(self.exclude_paths):
+            return await super().__acall__(request)
+        started, tokens = self.begin(request)
+        response = None
+        try:
+            response = await super().__acall__(request)
+            return response
+        finally:
+            self.end(request, response, started, tokens)
+
+    def begin(self, request) -> tuple:
+        request.request_metrics, metrics_token = metrics.start_request_metrics(self.profile_fields)
+        request.query_stats, stats_token = start_query_stats(detailed=False)
+        return time.perf_counter(), (metrics_token, stats_token)
+
+    def process_exception(self, request, exception):
+        metrics.record_exception(exception)
+        return None
+
+    def process_template_response(self, request, response):
+        # Отрисовка ответа DRF (Response.render) выполняется сразу после этого шага
+        request_metrics = getattr(request, 'request_metrics', None)
+        if request_metrics is not None:
+            request_metrics.render_started = time.perf_counter()
+        return response
+
+    def process_response(self, request, response):
+        request_metrics = getattr(request, 'request_metrics', None)
+        if request_metrics is not None and request_metrics.render_started is not None:
+            request_metrics.serialization += time.perf_counter() - request_metrics.render_started
+            request_metrics.render_started = None
+        if request_metrics is not None and request_metrics.fields and self.profile_header:
+            self.add_profile_header(response, request_metrics.fields)
+        return response
+
+    def add_profile_header(self, response, fields: dict) -> None:
+        """
+        Самые медленные пути вложенных полей в Server-Timing: ser.<путь>;dur=<мс>;desc="<вызовов>, db <мс>"
+        """
+        slowest = sorted(fields.items(), key=lambda item: item[1].seconds, reverse=True)[:self.profile_top]
+        for path, profile in slowest:
+            add_server_timing(response, 'ser.' + '.'.join(path), profile.seconds * 1000,
+                              f'{profile.calls} calls, db {profile.db_seconds * 1000:.2f}ms')
+
+    def end(self, request, response, started: float, tokens: tuple) -> None:
+        metrics_token, stats_token = tokens
+        try:
+            self.record(request, response, time.perf_counter() - started)
+        except Exception as e:
+            logger.warning(f'Ошибка записи метрик: {e}')
+        finally:
+            stop_query_stats(stats_token)
+            metrics.stop_request_metrics(metrics_token)
+
+    def record(self, request, response, duration: float) -> None:
+        match = getattr(request, 'resolver_match', None)
+        labels = {
+            'view': (match.view_name or match.route) if match else '<unresolved>',
+            'method': request.method,
+        }
+        registry = self.registry
+        request_metrics = request.request_metrics
+        registry.observe('http_request_duration_seconds', labels, duration)
+        registry.observe('http_request_db_seconds', labels, request.query_stats.duration / 1000)
+        registry.observe('http_request_serialization_seconds', labels, request_metrics.serialization)
+        status = response.status_code if response is not None else 500
+        if response is not None and not response.streaming:
+            registry.observe('http_response_size_bytes', labels, len(response.content))
+        registry.inc('http_requests_total', {**labels, 'status': f'{status // 100}xx'})
+        if request_metrics.exception is not None:
+            registry.inc('http_exceptions_total', {**labels, 'exception': request_metrics.exception})
+        for path, profile in (request_metrics.fields or {}).items():
+            field_labels = {**labels, 'path': '.'.join(path)}
+            registry.observe('serializer_field_seconds', field_labels, profile.seconds)
+            registry.observe('serializer_field_db_seconds', field_labels, profile.db_seconds)
+        registry.maybe_flush()
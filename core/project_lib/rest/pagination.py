@@ -1,14 +1,21 @@
 from collections import OrderedDict
 from math import ceil
 
+from django.core import signing
+from django.core.exceptions import ValidationError
 from django.core.paginator import InvalidPage, Page, EmptyPage, PageNotAnInteger
+from django.db.models import F, Q
 from django.utils.functional import cached_property
 from rest_framework.exceptions import NotFound
 from rest_framework.pagination import BasePagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
+from .counting import CountResult, CountStrategy
 from .exceptions import ClientLimitError
-from .views.mixins import FilterListMixin
+
+# Параметр запроса фильтрации списка (совпадает с FilterListMixin.query_filter_param представлений)
+FILTER_QUERY_PARAM = 'filter'
 
 
 def _positive_int(integer_string, strict=False, cutoff=None):
@@ -20,7 +27,20 @@ def _positive_int(integer_string, strict=False, cutoff=None):
     return ret
 
 
-class LimitOffsetPagination(BasePagination):
+class CountStrategyMixin:
+    """
+    Настройки подсчета общего количества записей пагинатора
+    """
+    count_estimate = False  # Оценка количества по статистике БД для выборок без фильтров
+    count_estimate_threshold = 10000  # Оценка используется только для таблиц не меньше порога
+    count_cache_timeout = 0  # Время жизни закешированного количества в секундах, 0 - без кеширования
+
+    def get_count_strategy(self) -> CountStrategy:
+        return CountStrategy(estimate=self.count_estimate, estimate_threshold=self.count_estimate_threshold,
+                             cache_timeout=self.count_cache_timeout)
+
+
+class LimitOffsetPagination(CountStrategyMixin, BasePagination):
     """
     Пагинация ответа limit/offset based style.
 
@@ -36,6 +56,7 @@ class LimitOffsetPagination(BasePagination):
 
     def __init__(self):
         self.count = 0
+        self.count_exact = True
         super(LimitOffsetPagination, self).__init__()
 
     def check_raise_limit_max(self, limit, count):
@@ -55,18 +76,29 @@ class LimitOffsetPagination(BasePagination):
             raise ClientLimitError()
 
     def paginate_queryset(self, queryset, request, view=None):
+        limit = self._get_limit(request)
+        offset = self._get_offset(request)
+        page = self.slice_queryset(queryset, request)
+        if limit is None and offset == 0:
+            return page
+        return list(page)
+
+    def slice_queryset(self, queryset, request):
+        """
+        Срез QuerySet запрошенной страницы без загрузки записей. Заполняет self.count
+        Используется потоковой отдачей списка (StreamingListMixin)
+        """
         limit = self._get_limit(request)
         offset = self._get_offset(request)
         self.count = self._get_count(queryset)
         # Если не используется фильтрация проверяем лимит ответа
-        if not request.query_params.get(FilterListMixin.query_filter_param):
+        if not request.query_params.get(FILTER_QUERY_PARAM):
             self.check_raise_limit_max(limit, self.count)
         if limit is None:
             if offset == 0:
                 return queryset
-            return list(queryset[offset:])
-        else:
-            return list(queryset[offset:offset + limit])
+            return queryset[offset:]
+        return queryset[offset:offset + limit]
 
     def get_paginated_response(self, data):
         """
@@ -76,12 +108,13 @@ class LimitOffsetPagination(BasePagination):
         """
         return Response(OrderedDict([
             ('count', self.count),
+            ('count_exact', self.count_exact),  # False - count является оценкой
             ('results', data)
         ]))
 
     def _get_limit(self, request):
         # при наличии фильтров лимит либо берется из запроса либо отсутствует
-        if request.query_params.get(FilterListMixin.query_filter_param):
+        if request.query_params.get(FILTER_QUERY_PARAM):
             if request.query_params.get(self.limit_query_param):
                 try:
                     return _positive_int(request.query_params.get(self.limit_query_param))
@@ -107,15 +140,231 @@ class LimitOffsetPagination(BasePagination):
     def to_html(self):
         return ''
 
-    @staticmethod
-    def _get_count(queryset):
+    def _get_count(self, queryset):
         """
-        Количество записей
+        Количество записей. Признак точности сохраняется в self.count_exact
         """
+        result = self.get_count_strategy().count(queryset)
+        self.count_exact = result.exact
+        return result.value
+
+
+class CursorPagination(LimitOffsetPagination):
+    """
+    Пагинация по курсору (keyset): следующая страница выбирается условием по паре (ключ сортировки, id)
+    после последней записи текущей страницы, а не смещением. Стоимость любой страницы одинакова,
+    если на (ключ сортировки, id) есть индекс.
+    Курсор непрозрачный и подписан SECRET_KEY, клиент передает его из полей next/previous ответа.
+
+    http://api.example.org/materials/?limit=50
+    http://api.example.org/materials/?limit=50&cursor=eyJ2Ijo...
+
+    Лимит и режим фильтрации как у LimitOffsetPagination: при фильтрации без limit отдаются все записи.
+    Значения NULL ключа сортировки идут в конце списка.
+    Пример:
+        class LearnMaterialCursorPagination(CursorPagination):
+            ordering = 'name'  # Models.Meta.indexes = [models.Index(fields=['name', 'id'])]
+    """
+    cursor_query_param = 'cursor'
+    ordering = 'id'  # Ключ сортировки, '-' для обратного порядка
+    cursor_salt = 'project_lib.rest.pagination.CursorPagination'
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self):
+        super().__init__()
+        self.has_next = False
+        self.has_previous = False
+        self.next_position = None
+        self.previous_position = None
+        self.request = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        limit, sort_field, position, forward = self._prepare(queryset, request)
+        return self._fetch_page(queryset, sort_field, position, forward, limit)
+
+    def slice_queryset(self, queryset, request):
+        """
+        QuerySet страницы по курсору для потоковой отдачи (StreamingListMixin). Заполняет self.count
+        Без limit - все записи после курсора одним запросом, с limit - записи выбранной страницы
+        """
+        limit, sort_field, position, forward = self._prepare(queryset, request)
+        order_by = self._get_order_by(sort_field, True)
+        if limit is None:
+            if position is not None:
+                queryset = queryset.filter(self._seek_filter(sort_field, position, forward))
+            return queryset.order_by(*order_by)
+        page = self._fetch_page(queryset, sort_field, position, forward, limit)
+        return queryset.filter(pk__in=[instance.pk for instance in page]).order_by(*order_by)
+
+    def _prepare(self, queryset, request) -> tuple:
+        """
+        Лимит, ключ сортировки, позиция курсора и направление. Заполняет self.count
+        """
+        self.request = request
+        limit = self._get_limit(request)
+        self.count = self._get_count(queryset)
+        if not request.query_params.get(FILTER_QUERY_PARAM):
+            self.check_raise_limit_max(limit, self.count)
+        sort_field = self._get_sort_field(queryset.model)
+        position, direction = self.decode_cursor(request, sort_field)
+        return limit, sort_field, position, direction == self.NEXT
+
+    def _fetch_page(self, queryset, sort_field, position, forward, limit) -> list:
+        """
+        Записи страницы: этапы выборки (_seek_phases) читаются по очереди, пока не набрано limit + 1 записей
+        """
+        page = []
+        for phase in self._seek_phases(queryset, sort_field, position, forward):
+            if limit is None:
+                page.extend(phase)
+                continue
+            need = limit + 1 - len(page)
+            if need <= 0:
+                break
+            page.extend(phase[:need])
+        has_more = limit is not None and len(page) > limit
+        if has_more:
+            page = page[:limit]
+        if not forward:
+            page.reverse()
+
+        if forward:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        else:
+            self.has_next = True
+            self.has_previous = has_more
+        if page:
+            self.next_position = self._get_position(page[-1], sort_field)
+            self.previous_position = self._get_position(page[0], sort_field)
+        elif position is not None:
+            # Пустая страница: возвращаться можно от той же позиции
+            self.next_position = self.previous_position = position
+            self.has_next = self.has_next and not forward
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('count_exact', self.count_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self):
+        if not self.has_next or self.next_position is None:
+            return None
+        return self._make_link(self.next_position, self.NEXT)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.previous_position is None:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._make_link(self.previous_position, self.PREVIOUS)
+
+    def _make_link(self, position, direction):
+        cursor = signing.dumps({'v': position[0], 'id': position[1], 'd': direction}, salt=self.cursor_salt,
+                               compress=True)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, sort_field):
+        """
+        Разобрать курсор запроса
+        :return: Позиция (значение ключа сортировки, id) или None для первой страницы и направление
+        :raises NotFound: Курсор поврежден или подписан другим ключом
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, self.NEXT
         try:
-            return queryset.total_count()
-        except (AttributeError, TypeError):
-            return len(queryset)
+            payload = signing.loads(cursor, salt=self.cursor_salt)
+            direction = payload['d']
+            if direction not in (self.NEXT, self.PREVIOUS):
+                raise ValueError
+            value = payload['v']
+            if value is not None:
+                value = sort_field.to_python(value)
+            pk = sort_field.model._meta.pk.to_python(payload['id'])
+        except (signing.BadSignature, ValidationError, KeyError, TypeError, ValueError):
+            raise NotFound('Некорректный курсор.')
+        return (value, pk), direction
+
+    def _get_sort_field(self, model):
+        return model._meta.get_field(self.ordering.lstrip('-'))
+
+    @staticmethod
+    def _get_position(instance, sort_field):
+        value = sort_field.value_from_object(instance)
+        pk_field = instance._meta.pk
+        return (None if value is None else sort_field.value_to_string(instance),
+                pk_field.value_to_string(instance))
+
+    def _get_order_by(self, sort_field, forward):
+        descending = self.ordering.startswith('-')
+        if not forward:
+            descending = not descending
+        pk_name = sort_field.model._meta.pk.name
+        if sort_field.primary_key:
+            return [f'-{pk_name}' if descending else pk_name]
+        # NULL всегда в конце списка, при обратном проходе - в начале
+        sort = F(sort_field.name).desc(nulls_last=forward, nulls_first=not forward) if descending else \
+            F(sort_field.name).asc(nulls_last=forward, nulls_first=not forward)
+        return [sort, f'-{pk_name}' if descending else pk_name]
+
+    def _seek_phases(self, queryset, sort_field, position, forward) -> list:
+        """
+        Выборки записей после (forward) или до позиции в порядке чтения.
+        Записи со значением ключа и NULL выбираются отдельными этапами: условие по значению начинается
+        с границы диапазона (ключ >= значение), поэтому БД ищет позицию по индексу (ключ, id), а не просматривает его.
+        Следующий этап читается, только если предыдущего не хватило на страницу
+        """
+        descending = self.ordering.startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        # Порядок чтения: при обратном проходе сортировка меняется на противоположную
+        read_descending = descending if forward else not descending
+        pk_name = sort_field.model._meta.pk.name
+        pk_order = f'-{pk_name}' if read_descending else pk_name
+        if sort_field.primary_key:
+            if position is not None:
+                queryset = queryset.filter(**{f'pk__{lookup}': position[1]})
+            return [queryset.order_by(pk_order)]
+        name = sort_field.name
+        values = queryset.filter(**{f'{name}__isnull': False}).order_by(
+            F(name).desc() if read_descending else F(name).asc(), pk_order)
+        nulls = queryset.filter(**{f'{name}__isnull': True}).order_by(pk_order)
+        # NULL в конце списка: при прямом проходе идут после записей со значением, при обратном - до них
+        if position is None:
+            return [values, nulls] if forward else [nulls, values]
+        value, pk = position
+        if value is None:
+            nulls = nulls.filter(**{f'pk__{lookup}': pk})
+            return [nulls] if forward else [nulls, values]
+        values = values.filter(Q(**{f'{name}__{lookup}e': value}),
+                               Q(**{f'{name}__{lookup}': value}) | Q(**{name: value, f'pk__{lookup}': pk}))
+        return [values, nulls] if forward else [values]
+
+    def _seek_filter(self, sort_field, position, forward) -> Q:
+        """
+        Условие выборки всех записей после (forward) или до позиции одним запросом (потоковая отдача без limit)
+        """
+        value, pk = position
+        descending = self.ordering.startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        if sort_field.primary_key:
+            return Q(**{f'pk__{lookup}': pk})
+        name = sort_field.name
+        if value is None:
+            seek = Q(**{f'{name}__isnull': True, f'pk__{lookup}': pk})
+            # Перед NULL идут все записи со значением
+            return seek if forward else seek | Q(**{f'{name}__isnull': False})
+        # Граница диапазона первой, чтобы поиск по индексу начинался с позиции
+        seek = Q(**{f'{name}__{lookup}e': value}) & (
+            Q(**{f'{name}__{lookup}': value}) | Q(**{name: value, f'pk__{lookup}': pk}))
+        # После записей со значением идут NULL
+        return seek | Q(**{f'{name}__isnull': True}) if forward else seek
 
 
 class QuerySetPaginator:
@@ -123,12 +372,14 @@ class QuerySetPaginator:
     Обертка QuerySet в блоки в виде страниц с количеством объектов на странице
     """
 
-    def __init__(self, queryset, per_page):
+    def __init__(self, queryset, per_page, count_strategy: CountStrategy = None):
         """
         :param queryset: QuerySet для пагинации страниц
         :param per_page: количество инстансов на тсранице
+        :param count_strategy: Способ подсчета количества записей
         """
         self.queryset = queryset
+        self.count_strategy = count_strategy or CountStrategy()
         if per_page is None:
             per_page = 0
         self.per_page = int(per_page)
@@ -140,7 +391,7 @@ class QuerySetPaginator:
         number = self.get_valid_num(number)
         bottom = (number - 1) * self.per_page
         top = bottom + self.per_page
-        if top >= self.total_count:
+        if top >= self.total_count and self.total_count_exact:
             top = self.total_count
         return self._get_page(self.queryset[bottom:top], number, self)
 
@@ -160,17 +411,23 @@ class QuerySetPaginator:
             raise PageNotAnInteger('Ожидалось целое число')
         if number < 1:
             raise EmptyPage('Страница не может быть меньше 1')
-        if number > self.total_pages and self.total_pages:
+        if number > self.total_pages and self.total_pages and self.total_count_exact:
             raise EmptyPage('Конец страниц')
         return number
 
     @cached_property
+    def count_result(self) -> CountResult:
+        return self.count_strategy.count(self.queryset)
+
+    @property
     def total_count(self):
         """Количество записей в БД(всего)."""
-        try:
-            return self.queryset.total_count()
-        except (AttributeError, TypeError):
-            return len(self.queryset)
+        return self.count_result.value
+
+    @property
+    def total_count_exact(self) -> bool:
+        """Количество записей точное (False - оценка по статистике БД)"""
+        return self.count_result.exact
 
     @cached_property
     def total_pages(self):
@@ -181,7 +438,7 @@ class QuerySetPaginator:
         return ceil(hits / self.per_page)
 
 
-class PageNumberPagination(BasePagination):
+class PageNumberPagination(CountStrategyMixin, BasePagination):
     """
     Постраничный пагинатор ответа сервера
     Для перехода по страницам используется параметр запроса ?page
@@ -196,7 +453,7 @@ class PageNumberPagination(BasePagination):
     page_size = 100
 
     def is_filter(self, request):
-        return request.query_params.get(FilterListMixin.query_filter_param)
+        return request.query_params.get(FILTER_QUERY_PARAM)
 
     def get_size_for_page(self, request):
         """
@@ -222,7 +479,7 @@ class PageNumberPagination(BasePagination):
         """Обработка пагинации QuerySet"""
         size = self.get_size_for_page(request)
 
-        paginator = QuerySetPaginator(queryset, size)
+        paginator = QuerySetPaginator(queryset, size, self.get_count_strategy())
         page_number = request.query_params.get(self.page_query_param, 1)
 
         try:
@@ -240,6 +497,7 @@ class PageNumberPagination(BasePagination):
             ('per_page', self.get_size_for_page(self.request)),  # Колияество элементов допустимое на странице
             ('total_pages', self.page.paginator.total_pages),  # Всего страниц(количество)
             ('total_items', self.page.paginator.total_count),  # Всего записей в БД
+            ('total_items_exact', self.page.paginator.total_count_exact),  # False - total_items является оценкой
             ('current_count_page', len(data)),  # Количество на странице(в данный момент)
             ('results', data)  # Результат
         ]))
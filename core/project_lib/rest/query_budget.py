@@ -0,0 +1,256 @@
+import re
+import time
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.serializers import BaseSerializer
+
+from .metrics import FieldProfile, get_field_profile
+
+# Статистика запросов текущего запроса пользователя (None - учет выключен)
+_current_stats: ContextVar[Optional['QueryStats']] = ContextVar('query_stats', default=None)
+# Путь поля сериалайзера, которое сейчас сериализуется, например ('students', 'group')
+_field_path: ContextVar[Tuple[str, ...]] = ContextVar('serializer_field_path', default=())
+
+# Списки параметров IN (%s, %s, ...) разной длины дают одну сигнатуру
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+def query_signature(sql: str) -> str:
+    """
+    Форма запроса без значений: запросы отличающиеся только параметрами имеют одну сигнатуру
+    """
+    return _NUMBER.sub('?', _IN_LIST.sub('(%s...)', sql))
+
+
+@dataclass
+class QuerySignature:
+    """
+    Повторяющийся запрос одной формы
+    """
+    sql: str
+    count: int = 0
+    duration: float = 0.0  # мс
+    paths: Counter = field(default_factory=Counter)  # Пути полей сериалайзера, вызвавшие запрос
+
+    def as_dict(self) -> dict:
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'duration': round(self.duration, 3),
+            'paths': ['.'.join(path) or '<root>' for path, _ in self.paths.most_common()],
+        }
+
+
+class QueryStats:
+    """
+    Запросы к БД выполненные за время обработки одного запроса пользователя
+    """
+
+    def __init__(self, detailed: bool = True) -> None:
+        """
+        :param detailed: Учитывать сигнатуры запросов и пути полей сериалайзера (иначе только количество и время)
+        """
+        self.detailed = detailed
+        self.count = 0
+        self.duration = 0.0  # мс
+        self.signatures: Dict[str, QuerySignature] = {}
+
+    def record(self, sql: str, duration: float, path: Tuple[str, ...]) -> None:
+        self.count += 1
+        self.duration += duration
+        if not self.detailed:
+            return
+        key = query_signature(sql)
+        signature = self.signatures.get(key)
+        if signature is None:
+            signature = self.signatures[key] = QuerySignature(key)
+        signature.count += 1
+        signature.duration += duration
+        signature.paths[path] += 1
+
+    def repeated(self, threshold: int = 2) -> List[QuerySignature]:
+        """
+        Запросы одной формы выполненные не менее threshold раз (признак N+1)
+        """
+        return sorted((s for s in self.signatures.values() if s.count >= threshold),
+                      key=lambda s: s.count, reverse=True)
+
+    @property
+    def max_repeated(self) -> int:
+        return max((s.count for s in self.signatures.values()), default=0)
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """
+    Допустимые значения для одного запроса пользователя. None - без ограничения
+    Пример:
+        class UserListView(ListAPIView):
+            query_budget = QueryBudget(queries=5, repeated=2)
+    """
+    queries: Optional[int] = None  # Количество запросов к БД
+    db_time_ms: Optional[float] = None  # Суммарное время запросов, мс
+    repeated: Optional[int] = None  # Количество повторов запроса одной формы (N+1)
+
+    def violations(self, stats: QueryStats) -> List[str]:
+        result = []
+        if self.queries is not None and stats.count > self.queries:
+            result.append(f'запросов {stats.count} > {self.queries}')
+        if self.db_time_ms is not None and stats.duration > self.db_time_ms:
+            result.append(f'время БД {stats.duration:.1f} мс > {self.db_time_ms} мс')
+        if self.repeated is not None and stats.max_repeated > self.repeated:
+            result.append(f'повторов запроса {stats.max_repeated} > {self.repeated}')
+        return result
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Превышен бюджет запросов к БД (режим QUERY_BUDGET_MODE = 'raise', для тестов)
+    """
+
+    def __init__(self, message: str, stats: QueryStats) -> None:
+        super().__init__(message)
+        self.stats = stats
+
+
+def query_budget(queries: int = None, db_time_ms: float = None, repeated: int = None):
+    """
+    Декоратор бюджета запросов для функции представления или класса представления
+    Пример:
+        @query_budget(queries=10, repeated=3)
+        def report(request): ...
+    """
+
+    def decorator(view):
+        view.query_budget = QueryBudget(queries, db_time_ms, repeated)
+        return view
+
+    return decorator
+
+
+def get_view_budget(view_func) -> Optional[QueryBudget]:
+    """
+    Бюджет указанный у представления: у функции, у класса View (view_class) или APIView (cls)
+    """
+    for owner in (view_func, getattr(view_func, 'view_class', None), getattr(view_func, 'cls', None)):
+        budget = getattr(owner, 'query_budget', None)
+        if isinstance(budget, QueryBudget):
+            return budget
+    return None
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    """
+    Статистика запросов текущего запроса пользователя
+    """
+    return _current_stats.get()
+
+
+def start_query_stats(detailed: bool = True) -> tuple:
+    """
+    Начать учет запросов в текущем контексте
+    Если учет уже ведется (вложенные промежуточные слои), используется та же статистика
+    :param detailed: Учитывать сигнатуры запросов и пути полей
+    :return: Статистика и токен для stop_query_stats
+    """
+    install_query_recorder()
+    stats = _current_stats.get()
+    if stats is None:
+        stats = QueryStats(detailed)
+    elif detailed:
+        stats.detailed = True
+    return stats, _current_stats.set(stats)
+
+
+def stop_query_stats(token) -> None:
+    _current_stats.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обертка выполнения запросов (connection.execute_wrapper)
+    Без активного учета запрос выполняется без замеров
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, (time.perf_counter() - started) * 1000, _field_path.get())
+
+
+def _install(connection) -> None:
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorder() -> None:
+    """
+    Подключить учет запросов к соединениям текущего потока
+    Соединения других потоков (sync_to_async под ASGI) подключаются при создании (connection_created)
+    """
+    connection_created.connect(_on_connection_created, dispatch_uid='project_lib.query_budget')
+    for connection in connections.all():
+        _install(connection)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install(connection)
+
+
+def is_tracking_fields() -> bool:
+    """
+    Нужно ли отслеживать путь полей сериалайзера: учет N+1 или профилирование вложенных полей
+    """
+    stats = _current_stats.get()
+    return (stats is not None and stats.detailed) or get_field_profile() is not None
+
+
+def represent_with_field_paths(serializer, instance) -> OrderedDict:
+    """
+    Serializer.to_representation с записью пути каждого поля в контекст,
+    чтобы запросы вызванные полем (N+1) были привязаны к его пути.
+    При профилировании (SERIALIZER_PROFILING) время вложенных сериалайзеров накапливается по путям
+    """
+    ret = OrderedDict()
+    base_path = _field_path.get()
+    profile = get_field_profile()
+    stats = _current_stats.get()
+    for serializer_field in serializer._readable_fields:
+        path = base_path + (serializer_field.field_name,)
+        token = _field_path.set(path)
+        started = None
+        if profile is not None and isinstance(serializer_field, BaseSerializer):
+            started = time.perf_counter()
+            db_started = stats.duration if stats is not None else 0.0
+        try:
+            try:
+                attribute = serializer_field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            if check_for_none is None:
+                ret[serializer_field.field_name] = None
+            else:
+                ret[serializer_field.field_name] = serializer_field.to_representation(attribute)
+        finally:
+            _field_path.reset(token)
+            if started is not None:
+                entry = profile.get(path)
+                if entry is None:
+                    entry = profile[path] = FieldProfile()
+                entry.seconds += time.perf_counter() - started
+                if stats is not None:
+                    entry.db_seconds += (stats.duration - db_started) / 1000
+                entry.calls += 1
+    return ret
@@ -0,0 +1,204 @@
+from typing import Optional
+
+from django.db.models import Prefetch, QuerySet
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+
+class QuerySetPlan:
+    """
+    План выборки для QuerySet построенный по структуре вложенности динамического сериалайзера
+    - select_related для прямых связей FK/OneToOne и обратных OneToOne
+    - Prefetch для обратных FK и ManyToMany связей (с собственным планом для вложенного QuerySet)
+    - only() с колонками запрошенных полей, ключами и внешними ключами необходимыми для связей
+    Пример:
+        plan = build_query_plan(models.CustomUser, parse_field_spec('id,name,user_user[id].group[id|name]'))
+        plan.apply(models.CustomUser.objects.all())
+    """
+
+    def __init__(self, model, select_related: list = None, prefetch_related: list = None,
+                 only: Optional[list] = None) -> None:
+        """
+        :param only: Колонки для only(). None - колонки не ограничиваются
+        """
+        self.model = model
+        self.select_related = select_related or []
+        self.prefetch_related = prefetch_related or []
+        self.only = only
+
+    def apply(self, queryset: QuerySet, project: bool = True) -> QuerySet:
+        """
+        Применить план к QuerySet
+        :param project: Ограничить выбираемые колонки через only().
+            Для изменения объектов лучше отключать, чтобы не подгружать отложенные поля по одному
+        """
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if project and self.only is not None:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+    def add_only(self, fields: Optional[list], prefix: str = '') -> None:
+        """
+        Добавить колонки в only()
+        :param fields: Имена полей. None для корневой модели отключает ограничение колонок
+        :param prefix: Префикс пути связи select_related
+        """
+        if fields is None:
+            if not prefix:
+                self.only = None
+            return
+        if self.only is None:
+            return
+        for name in fields:
+            name = f'{prefix}{name}'
+            if name not in self.only:
+                self.only.append(name)
+
+    def __bool__(self):
+        return bool(self.select_related or self.prefetch_related or self.only)
+
+    def __repr__(self):
+        return f'<QuerySetPlan {self.model.__name__}: select_related={self.select_related} ' \
+               f'prefetch_related={[p.prefetch_through for p in self.prefetch_related]} only={self.only}>'
+
+
+def get_relation_field(model, name: str):
+    """
+    Найти поле связи модели по имени поля сериалайзера
+    Для обратных связей имя совпадает с related_name или <model>_set (так их называет ModelSerializer)
+    :param model: Класс модели
+    :param name: Имя поля сериалайзера
+    :return: Поле связи или None если такой связи нет
+    """
+    for field in model._meta.get_fields():
+        if not field.is_relation:
+            continue
+        if field.auto_created and not field.concrete:
+            field_name = field.get_accessor_name()
+        else:
+            field_name = field.name
+        if field_name == name:
+            return field
+    return None
+
+
+def is_single_relation(field) -> bool:
+    """
+    Связь возвращает один объект (можно подтянуть через JOIN)
+    """
+    return bool(field.many_to_one or field.one_to_one)
+
+
+def get_only_fields(model, fields) -> Optional[list]:
+    """
+    Колонки модели необходимые для вывода полей сериалайзера
+    :param model: Класс модели
+    :param fields: Поля сериалайзера (могут содержать __all__ и имена связей)
+    :return: Список имен полей для only() или None если колонки определить нельзя
+    """
+    if not fields:
+        return None
+    concrete_fields = [f.name for f in model._meta.concrete_fields]
+    only = [model._meta.pk.name]
+    for name in fields:
+        if name == '__all__':
+            only.extend(concrete_fields)
+        elif name in concrete_fields:
+            only.append(name)
+        elif get_relation_field(model, name) is not None:
+            # Обратная связь или ManyToMany - колонок в таблице модели нет
+            continue
+        else:
+            # Поле не из модели (например SerializerMethodField) - ему может понадобиться что угодно
+            return None
+    return list(dict.fromkeys(only))
+
+
+def build_query_plan(model, spec: Optional['FieldSpec'], plan: Optional[QuerySetPlan] = None,
+                     prefix: str = '') -> QuerySetPlan:
+    """
+    Построить план выборки по дереву полей динамического сериалайзера
+    :param model: Модель для которой строится план
+    :param spec: Дерево полей (Meta.spec сериалайзера). None - колонки не ограничиваются, связей нет
+    :param plan: План в который добавляются связи. По умолчанию создается новый
+    :param prefix: Префикс пути связи для цепочек select_related
+    :return: План выборки
+    """
+    if plan is None:
+        plan = QuerySetPlan(model, only=[])
+    only = get_only_fields(model, spec.fields if spec else None)
+    if only is None and prefix:
+        # Модель подтягивается JOIN-ом, нужны все ее колонки
+        only = [f.name for f in model._meta.concrete_fields]
+    plan.add_only(only, prefix)
+    for name, child in (spec.children if spec else ()):
+        field = get_relation_field(model, name)
+        if field is None:
+            # Неизвестное поле, ошибку о нем выдаст сериалайзер
+            continue
+        related_model = field.related_model
+        if is_single_relation(field):
+            plan.select_related.append(f'{prefix}{name}')
+            # Прямые связи дочернего узла подтягиваем тем же JOIN, обратные - отдельным prefetch
+            build_query_plan(related_model, child, plan, prefix=f'{prefix}{name}__')
+        else:
+            child_plan = build_query_plan(related_model, child)
+            if field.one_to_many:
+                # Внешний ключ на родителя нужен для раскладки prefetch по объектам
+                child_plan.add_only([field.field.name])
+            queryset = child_plan.apply(related_model._default_manager.all())
+            plan.prefetch_related.append(Prefetch(f'{prefix}{name}', queryset=queryset))
+    return plan
+
+
+# noinspection PyUnresolvedReferences
+class QuerySetPlanMixin:
+    """
+    Примесь к представлению которая применяет план выборки сериалайзера к QuerySet.
+    Связи указанные в attrs динамического сериалайзера подтягиваются автоматически,
+    количество запросов не зависит от размера страницы. Для чтения выбираются только нужные колонки.
+    Пример:
+        class UserDetailView(QuerySetPlanMixin, ModelViewSet):
+            queryset = models.CustomUser.objects.all()
+            serializer_class = DynamicSerializerModel(model=models.CustomUser, attrs="__all__,user_user[__all__]").build()
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        get_query_plan = getattr(self.get_serializer_class(), 'get_query_plan', None)
+        if get_query_plan is None:
+            return queryset
+        # Колонки ограничиваем только для чтения, при изменении объект должен быть загружен полностью.
+        # Без запроса (генерация схемы, прямой вызов get_queryset) колонки не ограничиваются
+        request = getattr(self, 'request', None)
+        return get_query_plan().apply(queryset, project=request is not None and request.method in SAFE_METHODS)
+
+
+# noinspection PyUnresolvedReferences
+class ValuesEngineListMixin:
+    """
+    Примесь к представлению для сериалайзеров построенных с engine='values'.
+    Страница выбирается пагинатором по первичным ключам, данные страницы читаются через .values()
+    без создания экземпляров моделей. Если сериалайзер не поддерживает чтение через .values()
+    (SerializerMethodField, свои валидаторы) - используется обычный list()
+    Пример:
+        class StudentView(ValuesEngineListMixin, QuerySetPlanMixin, ModelViewSet):
+            queryset = models.Student.objects.all()
+            serializer_class = DynamicSerializerModel(model=models.Student, attrs="__all__").build(engine='values')
+    """
+
+    def list(self, request, *args, **kwargs):
+        from .serializers.values_engine import ValuesEngine
+
+        queryset = self.filter_queryset(self.get_queryset())
+        child = getattr(self.get_serializer(queryset, many=True), 'child', None)
+        if child is None or not ValuesEngine.supports(child):
+            return super().list(request, *args, **kwargs)
+        engine = ValuesEngine(child)
+        page = self.paginate_queryset(queryset.values_list(queryset.model._meta.pk.name, flat=True))
+        if page is None:
+            return Response(engine.represent(queryset))
+        return self.get_paginated_response(engine.represent(queryset, pks=list(page)))
@@ -15,3 +15,21 @@ def binary_response(data, report_name, conten_type="odt"):
     response['Content-Disposition'] = content_disposition
     response['Content-Transfer-Encoding'] = 'binary'
     return response
+
+
+def add_server_timing(response, name: str, duration: float = None, description: str = None):
+    """
+    Добавить метрику в заголовок Server-Timing
+    :param response: Ответ сервера
+    :param name: Имя метрики
+    :param duration: Длительность, мс
+    :param description: Описание
+    """
+    metric = name
+    if description:
+        metric += f';desc="{description}"'
+    if duration is not None:
+        metric += f';dur={duration:.2f}'
+    existing = response.get('Server-Timing')
+    response['Server-Timing'] = f'{existing}, {metric}' if existing else metric
+    return response
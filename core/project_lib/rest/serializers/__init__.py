@@ -1,4 +1,11 @@
 from .meta import DynamicSerializerModel
+from .registry import SerializerRegistry, serializer_registry
+from .spec import FieldSpec, FieldSpecSyntaxError, parse_field_spec
+from .fast import ExtractionPlan, FastListSerializer, FastRepresentationMixin
+from .values_engine import ValuesEngine, ValuesListSerializer
+from .validators import BatchUniqueListSerializer, BatchUniqueListSerializerMixin
+from .bulk_write import BulkWriteListSerializer
+from .lazy import LazySerializer, lazy_serializer, lazy_serializer_registry
 from .mixins import NestedSavingMixin, OwnedObjectSerializerMixin
 
 try:
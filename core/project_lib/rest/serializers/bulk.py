@@ -1,15 +1,25 @@
 import inspect
-from uuid import UUID
+from collections import defaultdict
 
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
 from rest_framework_bulk import BulkListSerializer
 
+from .bulk_write import RelatedPrefetchListMixin
+from .validators import BatchUniqueListSerializerMixin
 
-class BulkListSerializerFixUUID(BulkListSerializer):
+
+class BulkListSerializerFixUUID(RelatedPrefetchListMixin, BatchUniqueListSerializerMixin, BulkListSerializer):
     """
     Сериалайзер который исправляем получения объекта для изменения по ключу преобразовывая его в строку
     Исправление касается pk у модели с типом UUIDFIeld
 
+    Изменение выполняется пакетно: записи группируются по набору измененных полей,
+    каждая группа сохраняется одним bulk_update (порциями по batch_size).
+    Записи со связями многие ко многим сохраняются через child.update по одной.
+    Уникальность полей и значения внешних ключей проверяются для всего списка одним запросом на поле.
+
     Пример использования:
     class ModelBulkSerializer(BulkSerializerMixin, serializers.ModelSerializer):
         class Meta:
@@ -17,35 +27,79 @@ class BulkListSerializerFixUUID(BulkListSerializer):
             model = Model1
             fields = '__all__'
     """
+    batch_size = 1000  # Количество записей в одном запросе UPDATE
+
+    def run_validation(self, data=empty):
+        if isinstance(data, list):
+            self.prefetch_related_values(data)
+        return super().run_validation(data)
 
     def update(self, queryset, all_validated_data):
         id_attr = getattr(self.child.Meta, 'update_lookup_field', 'id')
+        model = queryset.model
+        lookup_field = model._meta.get_field(id_attr)
 
-        all_validated_data_by_id = {
-            i.pop(id_attr): i
-            for i in all_validated_data
-        }
-
-        if not all((bool(i) and not inspect.isclass(i)
-                    for i in all_validated_data_by_id.keys())):
-            raise ValidationError('')
+        all_validated_data_by_id = {}
+        for validated_data in all_validated_data:
+            obj_id = validated_data.pop(id_attr)
+            if not obj_id or inspect.isclass(obj_id):
+                raise ValidationError('')
+            # Ключи приводятся к одному виду один раз: UUID и его строковое представление совпадают
+            all_validated_data_by_id[self._normalize_key(lookup_field, obj_id)] = validated_data
 
-        objects_to_update = queryset.filter(**{
-            f'{id_attr}__in': all_validated_data_by_id.keys(),
-        })
+        objects_to_update = list(queryset.filter(**{
+            f'{id_attr}__in': list(all_validated_data_by_id.keys()),
+        }))
 
-        if len(all_validated_data_by_id) != objects_to_update.count():
+        if len(all_validated_data_by_id) != len(objects_to_update):
             raise ValidationError('Не найдены все объекты для обновления.')
 
+        groups = defaultdict(list)
         updated_objects = []
-
         for obj in objects_to_update:
-            obj_id = getattr(obj, id_attr)
-            if isinstance(obj_id, UUID):
-                # Фикс получения данных по ключу через uuid
-                obj_id = str(obj_id)
-            obj_validated_data = all_validated_data_by_id.get(obj_id)
+            obj_validated_data = all_validated_data_by_id[self._normalize_key(lookup_field, getattr(obj, id_attr))]
+            changed_fields = self._apply_changes(obj, obj_validated_data)
+            if changed_fields is None:
+                # Есть поля которые нельзя сохранить через bulk_update
+                obj = self.child.update(obj, obj_validated_data)
+            elif changed_fields:
+                groups[changed_fields].append(obj)
+            updated_objects.append(obj)
 
-            updated_objects.append(self.child.update(obj, obj_validated_data))
+        manager = model._default_manager
+        for fields, objs in groups.items():
+            manager.bulk_update(objs, sorted(fields), batch_size=self.batch_size)
 
         return updated_objects
+
+    @staticmethod
+    def _normalize_key(lookup_field, value) -> str:
+        try:
+            return str(lookup_field.to_python(value))
+        except Exception:
+            return str(value)
+
+    @staticmethod
+    def _apply_changes(obj, validated_data: dict):
+        """
+        Записать значения в экземпляр
+        :return: Набор измененных полей или None если запись нужно сохранить через child.update
+        """
+        opts = obj._meta
+        changed = []
+        for attr, value in validated_data.items():
+            try:
+                field = opts.get_field(attr)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.many_to_many or field.primary_key:
+                return None
+            new = value
+            if field.is_relation and value is not None:
+                # Сравнение по значению внешнего ключа без загрузки связанного объекта
+                new = getattr(value, 'pk', value)
+            if getattr(obj, field.attname) != new:
+                changed.append((attr, field.name, value))
+        for attr, _, value in changed:
+            setattr(obj, attr, value)
+        return frozenset(name for _, name, _ in changed)
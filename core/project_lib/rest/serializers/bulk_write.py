@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+from rest_framework import relations, serializers
+from rest_framework.exceptions import ValidationError
+
+from .validators import BatchUniqueListSerializerMixin
+
+
+class RelatedPrefetchListMixin:
+    """
+    Примесь для ListSerializer: значения внешних ключей (PrimaryKeyRelatedField) всего списка
+    выбираются одним запросом на поле вместо запроса на каждый элемент при проверке
+    """
+
+    def prefetch_related_values(self, data: list) -> None:
+        """
+        Проверка значений внешних ключей одним запросом на поле вместо запроса на каждую запись
+        """
+        for field in self.child.fields.values():
+            if type(field) is not relations.PrimaryKeyRelatedField or field.read_only:
+                continue
+            values = {item[field.field_name] for item in data
+                      if isinstance(item, dict) and isinstance(item.get(field.field_name), (str, int))}
+            if not values:
+                continue
+            try:
+                found = field.get_queryset().in_bulk(list(values))
+            except (ValueError, TypeError, DjangoValidationError):
+                # Некорректные значения проверит само поле. Ошибки БД не перехватываются:
+                # после них транзакция PostgreSQL прервана и следующие запросы упадут с другой ошибкой
+                continue
+            field.to_internal_value = self._cached_to_internal_value(field.to_internal_value, found)
+
+    @staticmethod
+    def _cached_to_internal_value(to_internal_value, found: Dict):
+        by_key = {str(pk): instance for pk, instance in found.items()}
+
+        def cached(data):
+            instance = by_key.get(str(data))
+            if instance is None:
+                return to_internal_value(data)
+            return instance
+
+        return cached
+
+
+class BulkWriteListSerializer(RelatedPrefetchListMixin, BatchUniqueListSerializerMixin,
+                              serializers.ListSerializer):
+    """
+    Массовое создание и изменение записей через bulk_create/bulk_update.
+    Весь список проверяется одним ListSerializer, записи для изменения выбираются одним запросом pk__in,
+    значения внешних ключей (PrimaryKeyRelatedField) и уникальных полей для всего списка
+    проверяются одним запросом на поле.
+    Элементы с ключом id изменяют существующие записи, без id - создаются новые.
+
+    Связи многие ко многим и вложенные сериалайзеры не поддерживаются.
+    Пример:
+        serializer = BulkWriteListSerializer(child=StudentSerializer(), data=rows)
+        serializer.is_valid(raise_exception=True)
+        instances = serializer.bulk_save(batch_size=1000)
+    """
+    default_batch_size = 1000
+    id_attr = 'id'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instances_for_data: Optional[List[Optional[models.Model]]] = None
+
+    @property
+    def model(self):
+        return self.child.Meta.model
+
+    def run_validation(self, data=serializers.empty):
+        if isinstance(data, list):
+            self.instances_for_data = self.fetch_instances(data)
+            self.prefetch_related_values(data)
+        return super().run_validation(data)
+
+    def fetch_instances(self, data: list) -> List[Optional[models.Model]]:
+        """
+        Выбрать изменяемые записи одним запросом
+        :return: Экземпляры в порядке элементов data, None для создаваемых
+        """
+        ids = [item.get(self.id_attr) for item in data if isinstance(item, dict)]
+        ids = [i for i in ids if i]
+        if not ids:
+            return [None] * len(data)
+        pk_field = self.model._meta.pk
+        try:
+            instances = self.model._default_manager.in_bulk([pk_field.to_python(i) for i in ids])
+        except Exception:
+            raise ValidationError({self.id_attr: ['Некорректное значение первичного ключа.']})
+        by_key = {str(pk): instance for pk, instance in instances.items()}
+        missing = [str(i) for i in ids if str(pk_field.to_python(i)) not in by_key]
+        if missing:
+            raise ValidationError({'_detail': 'Не найдены все объекты для обновления.', 'not_found': missing})
+        result = []
+        for item in data:
+            key = item.get(self.id_attr) if isinstance(item, dict) else None
+            result.append(by_key[str(pk_field.to_python(key))] if key else None)
+        return result
+
+    def to_internal_value(self, data):
+        instances = iter(self.instances_for_data or ())
+        run_validation = self.child.run_validation
+
+        def run_with_instance(item):
+            # Изменяемая запись нужна проверкам уникальности, чтобы не сравнивать запись саму с собой
+            self.child.instance = next(instances, None)
+            return run_validation(item)
+
+        self.child.run_validation = run_with_instance
+        try:
+            return super().to_internal_value(data)
+        finally:
+            del self.child.run_validation
+            self.child.instance = None
+
+    def bulk_save(self, batch_size: int = None) -> List[models.Model]:
+        """
+        Сохранить проверенные данные
+        :param batch_size: Количество записей в одном запросе INSERT/UPDATE
+        :return: Экземпляры в порядке входных данных
+        """
+        assert hasattr(self, '_validated_data'), 'Перед bulk_save нужно вызвать is_valid()'
+        batch_size = batch_size or self.default_batch_size
+        instances_for_data = self.instances_for_data or [None] * len(self.validated_data)
+        many_to_many = {f.name for f in self.model._meta.many_to_many}
+        to_create, to_update, update_fields, result = [], [], {}, []
+        for instance, validated_data in zip(instances_for_data, self.validated_data):
+            if many_to_many.intersection(validated_data):
+                raise ValueError('Связи многие ко многим не поддерживаются при массовом сохранении')
+            if instance is None:
+                instance = self.model(**validated_data)
+                to_create.append(instance)
+            else:
+                for attr, value in validated_data.items():
+                    setattr(instance, attr, value)
+                update_fields.update(dict.fromkeys(validated_data))
+                to_update.append(instance)
+            result.append(instance)
+        if to_create:
+            self.model._default_manager.bulk_create(to_create, batch_size=batch_size)
+        update_fields.pop(self.model._meta.pk.name, None)
+        if to_update and update_fields:
+            self.model._default_manager.bulk_update(to_update, list(update_fields), batch_size=batch_size)
+        self.instance = result
+        return result
+
+    def save(self, **kwargs):
+        raise RuntimeError('Для массового сохранения используйте bulk_save()')
+
@@ -0,0 +1,244 @@
+import copy
+from collections import OrderedDict
+from operator import attrgetter, itemgetter
+from typing import Iterable, List
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+from ..metrics import start_serialization, stop_serialization
+
+VALUE = 'value'  # Значение поля модели с преобразованием
+ONE = 'one'  # Вложенный сериалайзер одного объекта
+MANY = 'many'  # Вложенный сериалайзер списка объектов
+GENERIC = 'generic'  # Поле обрабатывается стандартно через get_attribute/to_representation
+
+# Поля, у которых to_representation не зависит от контекста запроса.
+# Проверяется точное совпадение класса: наследники могут переопределять поведение
+SIMPLE_CONVERTERS = {
+    drf_fields.CharField: str,
+    drf_fields.EmailField: str,
+    drf_fields.SlugField: str,
+    drf_fields.IntegerField: int,
+    drf_fields.FloatField: float,
+}
+COPIED_CONVERTERS = (
+    drf_fields.BooleanField,
+    drf_fields.ChoiceField,
+    drf_fields.DateTimeField,
+    drf_fields.DateField,
+    drf_fields.TimeField,
+    drf_fields.DecimalField,
+    drf_fields.JSONField,
+)
+
+
+class ExtractionStep:
+    """
+    Шаг плана извлечения значения одного поля
+    """
+    __slots__ = ('kind', 'name', 'source', 'attr_getter', 'row_getter', 'converter', 'child_plan')
+
+    def __init__(self, kind: str, name: str, attr_getter=None, row_getter=None, converter=None,
+                 child_plan: 'ExtractionPlan' = None, source: str = None) -> None:
+        self.kind = kind
+        self.name = name
+        self.source = source or name
+        self.attr_getter = attr_getter
+        self.row_getter = row_getter
+        self.converter = converter
+        self.child_plan = child_plan
+
+
+class ExtractionPlan:
+    """
+    Плоский план извлечения данных для чтения, скомпилированный из полей сериалайзера.
+    Вместо обхода объектов полей DRF для каждой записи выполняет заранее подготовленные
+    функции получения атрибутов и преобразования значений. Результат совпадает с to_representation сериалайзера.
+    Поля, которые нельзя безопасно ускорить (SerializerMethodField, файлы, поля с source='*' и т.п.),
+    обрабатываются стандартным способом полем текущего сериалайзера.
+
+    План строится один раз для класса сериалайзера:
+        plan = ExtractionPlan.for_serializer(serializer)
+        plan.represent_many(queryset, serializer)
+        plan.represent_many(rows, serializer, rows=True)  # строки .values() с вложенными списками словарей
+    """
+
+    def __init__(self, steps: List[ExtractionStep]) -> None:
+        self.steps = steps
+
+    @classmethod
+    def for_serializer(cls, serializer: serializers.Serializer) -> 'ExtractionPlan':
+        """
+        План для класса сериалайзера (компилируется при первом обращении)
+        """
+        serializer_class = type(serializer)
+        plan = serializer_class.__dict__.get('_extraction_plan')
+        if plan is None:
+            plan = cls.compile(serializer)
+            serializer_class._extraction_plan = plan
+        return plan
+
+    @classmethod
+    def compile(cls, serializer: serializers.Serializer) -> 'ExtractionPlan':
+        """
+        Скомпилировать план по полям экземпляра сериалайзера
+        """
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+        return cls([cls._compile_field(field, model) for field in serializer._readable_fields])
+
+    @classmethod
+    def _compile_field(cls, field, model) -> ExtractionStep:
+        name = field.field_name
+        source_attrs = field.source_attrs
+        if len(source_attrs) != 1:
+            # source='*' или цепочка атрибутов
+            return ExtractionStep(GENERIC, name)
+        source = source_attrs[0]
+        if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.Serializer):
+            return ExtractionStep(MANY, name, attrgetter(source), itemgetter(source),
+                                  child_plan=cls.for_serializer(field.child), source=source)
+        if isinstance(field, serializers.Serializer):
+            return ExtractionStep(ONE, name, attrgetter(source), itemgetter(source),
+                                  child_plan=cls.for_serializer(field), source=source)
+        field_class = type(field)
+        if field_class is relations.PrimaryKeyRelatedField and field.pk_field is None and model is not None:
+            # Внешний ключ отдается значением колонки без загрузки связанного объекта
+            try:
+                attname = model._meta.get_field(source).attname
+            except Exception:
+                return ExtractionStep(GENERIC, name)
+            return ExtractionStep(VALUE, name, attrgetter(attname), itemgetter(source), source=source)
+        if field_class is drf_fields.UUIDField and field.uuid_format == 'hex_verbose':
+            return ExtractionStep(VALUE, name, attrgetter(source), itemgetter(source), str, source=source)
+        if field_class in SIMPLE_CONVERTERS:
+            return ExtractionStep(VALUE, name, attrgetter(source), itemgetter(source), SIMPLE_CONVERTERS[field_class],
+                                  source=source)
+        if field_class in COPIED_CONVERTERS:
+            # Копия поля не привязана к сериалайзеру и контексту запроса
+            converter = copy.deepcopy(field).to_representation
+            return ExtractionStep(VALUE, name, attrgetter(source), itemgetter(source), converter, source=source)
+        return ExtractionStep(GENERIC, name)
+
+    @property
+    def supports_rows(self) -> bool:
+        """
+        План можно выполнить над строками .values() (нет полей требующих экземпляр модели)
+        """
+        for step in self.steps:
+            if step.kind == GENERIC:
+                return False
+            if step.child_plan is not None and not step.child_plan.supports_rows:
+                return False
+        return True
+
+    def _bind(self, serializer: serializers.Serializer, rows: bool) -> list:
+        """
+        Привязать шаги плана к полям экземпляра сериалайзера. Выполняется один раз для экземпляра
+        """
+        attr = '_fast_bound_rows' if rows else '_fast_bound'
+        bound = serializer.__dict__.get(attr)
+        if bound is not None:
+            return bound
+        fields = serializer.fields
+        bound = []
+        for step in self.steps:
+            getter = step.row_getter if rows else step.attr_getter
+            if step.kind == GENERIC:
+                bound.append((GENERIC, step.name, fields[step.name], None))
+            elif step.kind == MANY:
+                bound.append((MANY, step.name, getter, (step.child_plan, fields[step.name].child)))
+            elif step.kind == ONE:
+                bound.append((ONE, step.name, getter, (step.child_plan, fields[step.name])))
+            else:
+                bound.append((VALUE, step.name, getter, step.converter))
+        setattr(serializer, attr, bound)
+        return bound
+
+    def represent(self, instance, serializer: serializers.Serializer, rows: bool = False) -> OrderedDict:
+        """
+        Представление одного объекта
+        :param instance: Экземпляр модели или строка .values()
+        :param serializer: Экземпляр сериалайзера по которому скомпилирован план
+        :param rows: instance является строкой .values()
+        """
+        return self._represent(instance, self._bind(serializer, rows), rows)
+
+    def represent_many(self, instances: Iterable, serializer: serializers.Serializer,
+                       rows: bool = False) -> list:
+        """
+        Представление списка объектов
+        """
+        bound = self._bind(serializer, rows)
+        return [self._represent(instance, bound, rows) for instance in instances]
+
+    @staticmethod
+    def _represent(instance, bound: list, rows: bool) -> OrderedDict:
+        ret = OrderedDict()
+        for kind, name, getter, extra in bound:
+            if kind == VALUE:
+                value = getter(instance)
+                if value is not None and extra is not None:
+                    value = extra(value)
+                ret[name] = value
+            elif kind == MANY:
+                value = getter(instance)
+                if value is None:
+                    ret[name] = None
+                    continue
+                if isinstance(value, models.Manager):
+                    value = value.all()
+                child_plan, child_serializer = extra
+                ret[name] = child_plan.represent_many(value, child_serializer, rows)
+            elif kind == ONE:
+                try:
+                    value = getter(instance)
+                except ObjectDoesNotExist:
+                    value = None
+                if value is None:
+                    ret[name] = None
+                    continue
+                child_plan, child_serializer = extra
+                ret[name] = child_plan.represent(value, child_serializer, rows)
+            else:
+                field = getter
+                try:
+                    attribute = field.get_attribute(instance)
+                except SkipField:
+                    continue
+                check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+                ret[name] = None if check_for_none is None else field.to_representation(attribute)
+        return ret
+
+
+class FastListSerializer(serializers.ListSerializer):
+    """
+    Список для сериалайзеров в режиме fast: все записи обрабатываются одним планом извлечения
+    """
+
+    def to_representation(self, data):
+        started = start_serialization()
+        try:
+            iterable = data.all() if isinstance(data, models.Manager) else data
+            return ExtractionPlan.for_serializer(self.child).represent_many(iterable, self.child)
+        finally:
+            stop_serialization(started)
+
+
+# noinspection PyUnresolvedReferences
+class FastRepresentationMixin:
+    """
+    Режим быстрого чтения динамического сериалайзера
+    DynamicSerializerModel(model=models.CustomUser, attrs="__all__,user_user[__all__]").build(fast=True)
+    Сериалайзер в этом режиме только для чтения
+    """
+
+    def to_representation(self, instance):
+        return ExtractionPlan.for_serializer(self).represent(instance, self)
+
+    def save(self, **kwargs):
+        raise RuntimeError(f'Сериалайзер {self.__class__.__name__} в режиме fast доступен только для чтения')
@@ -0,0 +1,110 @@
+import importlib
+import time
+from threading import RLock
+from typing import Iterable, List, Optional, Type
+
+from rest_framework import serializers
+
+from .meta import DynamicSerializerModel
+
+
+class LazySerializer:
+    """
+    Отложенное построение динамического сериалайзера.
+    Класс строится при первом обращении (создание экземпляра или доступ к атрибуту), а не при импорте модуля.
+    Используется вместо класса сериалайзера:
+        UserSerializer = lazy_serializer(model=CustomUser)
+        UserSerializer(data=data).is_valid()  # Здесь выполняется build()
+        UserSerializer.Meta.model  # Тоже
+    """
+
+    def __init__(self, model, attrs: str = '__all__', **build_kwargs) -> None:
+        """
+        :param model: Класс модели
+        :param attrs: Поля сериалайзера (синтаксис DynamicSerializerModel)
+        :param build_kwargs: Параметры DynamicSerializerModel.build
+        """
+        self.model = model
+        self.attrs = attrs
+        self.build_kwargs = build_kwargs
+        self._serializer_class = None
+        self._lock = RLock()
+
+    @property
+    def is_built(self) -> bool:
+        return self._serializer_class is not None
+
+    def resolve(self) -> Type[serializers.ModelSerializer]:
+        """
+        Класс сериалайзера (строится один раз)
+        """
+        serializer_class = self._serializer_class
+        if serializer_class is None:
+            with self._lock:
+                if self._serializer_class is None:
+                    self._serializer_class = DynamicSerializerModel(
+                        model=self.model, attrs=self.attrs).build(**self.build_kwargs)
+                serializer_class = self._serializer_class
+        return serializer_class
+
+    def __call__(self, *args, **kwargs) -> serializers.ModelSerializer:
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item in ('model', 'attrs', 'build_kwargs', '_serializer_class', '_lock'):
+            raise AttributeError(item)
+        return getattr(self.resolve(), item)
+
+    def __repr__(self) -> str:
+        state = 'built' if self.is_built else 'lazy'
+        return f'<LazySerializer {self.model._meta.label} {self.attrs!r} ({state})>'
+
+
+class LazySerializerRegistry:
+    """
+    Реестр отложенных сериалайзеров для предварительного построения (например в мастер процессе до fork)
+    Пример:
+        lazy_serializer_registry.warm()  # {'count': 9, 'built': 9, 'seconds': 0.12}
+    """
+
+    def __init__(self) -> None:
+        self._items: List[LazySerializer] = []
+        self._lock = RLock()
+
+    def register(self, serializer: LazySerializer) -> LazySerializer:
+        with self._lock:
+            self._items.append(serializer)
+        return serializer
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._items))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def warm(self, modules: Optional[Iterable[str]] = None) -> dict:
+        """
+        Построить все зарегистрированные сериалайзеры
+        :param modules: Модули объявляющие отложенные сериалайзеры, импортируются перед построением
+        :return: Количество сериалайзеров, сколько построено сейчас и затраченное время
+        """
+        for module in modules or ():
+            importlib.import_module(module)
+        started = time.perf_counter()
+        built = 0
+        for serializer in self:
+            if not serializer.is_built:
+                serializer.resolve()
+                built += 1
+        return {'count': len(self), 'built': built, 'seconds': round(time.perf_counter() - started, 4)}
+
+
+lazy_serializer_registry = LazySerializerRegistry()
+
+
+def lazy_serializer(model, attrs: str = '__all__', **build_kwargs) -> LazySerializer:
+    """
+    Объявить отложенный динамический сериалайзер и зарегистрировать его для предварительного построения
+    """
+    return lazy_serializer_registry.register(LazySerializer(model, attrs, **build_kwargs))
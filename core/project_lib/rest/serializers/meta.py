@@ -1,4 +1,3 @@
-import re
 from collections import OrderedDict
 from typing import Union, Type
 
@@ -8,7 +7,15 @@ from rest_framework import serializers
 from rest_framework.utils.field_mapping import get_nested_relation_kwargs
 
 from project_lib.rest.exceptions import BadRequestError
+from ..metrics import start_serialization, stop_serialization
+from ..query_budget import is_tracking_fields, represent_with_field_paths
+from ..query_plan import QuerySetPlan, build_query_plan
+from .fast import FastListSerializer, FastRepresentationMixin
 from .mixins import NestedSavingMixin
+from .registry import serializer_registry
+from .spec import ALL, DOT, SPLITTER_ENUM_FIELDS, SPLITTER_STR, FieldSpec, parse_field_spec
+from .validators import BatchUniqueListSerializer
+from .values_engine import ValuesListSerializer
 
 
 # noinspection PyUnresolvedReferences,PyArgumentList
@@ -28,8 +35,17 @@ class DynamicSerializerModel:
         DynamicSerializerModel(model=models.Teacher, attrs="__all__,personal_data[__all__]").build(bases)
         # Проброска extra_kwargs
         DynamicSerializerModel(model=models.Teacher, attrs="__all__").build(extra_kwargs_for_meta={'archivation_date': {'read_only': True}}))
+        # Быстрое чтение списков (только для чтения)
+        DynamicSerializerModel(model=models.Teacher, attrs="__all__,personal_data[__all__]").build(fast=True)
+        # Чтение QuerySet через .values() без создания экземпляров моделей
+        DynamicSerializerModel(model=models.Teacher, attrs="__all__,personal_data[__all__]").build(engine='values')
+    Построенные классы кешируются в serializer_registry: повторный вызов build() с теми же
+    моделью, attrs, extra_bases и extra_kwargs_for_meta вернет тот же класс без повторного разбора attrs.
+    Не изменяйте атрибуты полученного класса - он общий для всех вызовов. Если нужен отдельный класс
+    используйте build(use_cache=False)
     """
     NON_NULL = False  # исключать пустые поля из выборки
+    ENGINE_VALUES = 'values'  # Чтение списков через .values()
 
     def __init__(self, module_name=None, model_name=None, attrs="__all__", model=None):
         """
@@ -79,42 +95,76 @@ class DynamicSerializerModel:
 
         """
         self.model = model or ContentType.objects.get(app_label=module_name, model=model_name.lower()).model_class()
-        # Разбиваем если передали строку по ,
-        if isinstance(attrs, str):
-            attrs = attrs.split(",")
-        # Убираем пробелы
-        attrs = [w.strip() for w in attrs]
-        self.builder = BuildNesteting(attrs)
-        self.builder.parse()
-
-    def build(self, extra_bases=None, extra_kwargs_for_meta=None) -> Type[serializers.ModelSerializer]:
+        # Собираем в одну строку если передали список
+        if not isinstance(attrs, str):
+            attrs = BuildNesteting.SPLITTER_STR.join(attrs)
+        # Разбор кешируется по строке, повторный разбор тех же attrs бесплатный
+        self.spec = parse_field_spec(attrs)
+
+    def build(self, extra_bases=None, extra_kwargs_for_meta=None, use_cache=True,
+              fast=False, engine=None) -> Type[serializers.ModelSerializer]:
         """
         Возвращает готовый сериалайзер
+        :param extra_bases: Дополнительные базовые классы сериалайзера
         :param extra_kwargs_for_meta: словарь, который будет добавлен в аттрибут extra_kwargs класса Meta
+        :param use_cache: Брать класс из serializer_registry если он уже был построен
+        :param fast: Режим быстрого чтения. Поля компилируются в план извлечения (ExtractionPlan),
+            результат совпадает с обычным сериалайзером. Сериалайзер только для чтения
+        :param engine: Движок чтения списков. ENGINE_VALUES - QuerySet читается через .values() без создания
+            экземпляров моделей (ValuesEngine), включает режим fast
         :return:
         """
-        root_fields = []
+        if engine not in (None, self.ENGINE_VALUES):
+            raise ValueError(f'Неизвестный движок сериалайзера {engine}')
+        fast = fast or engine is not None
+        if not use_cache:
+            return self._build(extra_bases, extra_kwargs_for_meta, fast, engine)
+        key = serializer_registry.make_key(self.model, self.spec, extra_bases, extra_kwargs_for_meta,
+                                           {'fast': fast, 'engine': engine})
+        return serializer_registry.get_or_build(
+            key, lambda: self._build(extra_bases, extra_kwargs_for_meta, fast, engine)
+        )
+
+    def _build(self, extra_bases=None, extra_kwargs_for_meta=None, fast=False,
+               engine=None) -> Type[serializers.ModelSerializer]:
+        """
+        Построение нового класса сериалайзера
+        """
         fetch_field = []
         # Получаем поля первого уровня
-        for field in self.builder.get_root():
-            if field == "__all__":
-                root_fields.extend(self.convert_all_predicat(self.model._meta.fields))
-            else:
-                root_fields.append(field)
+        root_fields = self.expand_fields(self.spec.fields, self.model)
         root_fields = self.fill_m2m_fieldname(root_fields)
+        list_serializer = ValuesListSerializer if engine == self.ENGINE_VALUES else FastListSerializer
+        if fast:
+            extra_bases = [FastRepresentationMixin, *self._to_list(extra_bases)]
 
         class BuildDynamicSerializer(self.__get_nested_serializer(extra_bases)):
             class Meta:
                 model = self.model
                 fields = root_fields
-                childs = self.builder.get_nested()
-                depth = self.builder.get_depth()
+                spec = self.spec
+                depth = self.spec.depth
                 fetch = fetch_field
                 if extra_kwargs_for_meta:
                     extra_kwargs = extra_kwargs_for_meta
+                # Списки на запись проверяют уникальность полей одним запросом на поле
+                list_serializer_class = list_serializer if fast else BatchUniqueListSerializer
 
         return BuildDynamicSerializer
 
+    @classmethod
+    def expand_fields(cls, fields, model) -> list:
+        """
+        Раскрыть __all__ в список полей модели с сохранением порядка и без дублей
+        """
+        expanded = []
+        for field in fields:
+            if field == ALL:
+                expanded.extend(cls.convert_all_predicat(model._meta.fields))
+            else:
+                expanded.append(field)
+        return list(dict.fromkeys(expanded))
+
     @classmethod
     def convert_all_predicat(cls, fields) -> list:
         build = []
@@ -126,28 +176,66 @@ class DynamicSerializerModel:
         """
         Заполняет именами полей для связей many to many
         """
-        for f_name in self.builder.get_nested().keys():
+        for f_name, _ in self.spec.children:
             if list(filter(lambda x: x.name == f_name, self.model._meta.many_to_many)):
                 root_fields.append(f_name)
-        return list(set(root_fields))
+        return list(dict.fromkeys(root_fields))
+
+    @staticmethod
+    def _to_list(extra_bases) -> list:
+        if extra_bases is None:
+            return []
+        if not isinstance(extra_bases, (tuple, list)):
+            return [extra_bases]
+        return list(extra_bases)
 
     def __get_nested_serializer(self, extra_bases=None):
         """
         Рекурсивное создание сериалайзера с требуемыми полями
         """
-        if extra_bases is None:
-            extra_bases = []
-        if not isinstance(extra_bases, (tuple, list)):
-            extra_bases = [extra_bases]
+        extra_bases = self._to_list(extra_bases)
         bases = []
 
         bases.extend(extra_bases)
         bases.append(serializers.ModelSerializer)
 
+        # Классы вложенных сериалайзеров строятся один раз, а не при каждом создании экземпляра
+        nested_classes = {}
+
         class Nested(*bases):
 
             def to_representation(self, instance):
-                return super().to_representation(instance)
+                started = start_serialization()
+                try:
+                    if is_tracking_fields() and type(self).has_plain_representation():
+                        # Учет запросов (поиск N+1) или профилирование: запросы и время привязываются к пути поля
+                        return represent_with_field_paths(self, instance)
+                    return super().to_representation(instance)
+                finally:
+                    stop_serialization(started)
+
+            @classmethod
+            def has_plain_representation(cls) -> bool:
+                """
+                Представление строится стандартным Serializer.to_representation
+                (нет режима fast и примесей переопределяющих to_representation)
+                """
+                if '_plain_representation' not in cls.__dict__:
+                    mro = cls.__mro__
+                    owner = next(klass for klass in mro[mro.index(Nested) + 1:]
+                                 if 'to_representation' in klass.__dict__)
+                    cls._plain_representation = owner is serializers.Serializer
+                return cls._plain_representation
+
+            @classmethod
+            def get_query_plan(cls) -> QuerySetPlan:
+                """
+                План выборки (select_related/prefetch_related/only) для полей и связей указанных в attrs
+                Строится один раз для класса
+                """
+                if '_query_plan' not in cls.__dict__:
+                    cls._query_plan = build_query_plan(cls.Meta.model, cls.Meta.spec)
+                return cls._query_plan
 
             def build_unknown_field(self, field_name, model_class):
                 """
@@ -178,47 +266,23 @@ class DynamicSerializerModel:
                 """
                 Строитель вложенного сериалайзера с необходимыми полями
                 """
-                ALL = "__all__"  # Выборка всех полей
-                root_fields = []  # Поля первого уровня
-                child_field = {}  # Словарь с информацией о вложенных сериалайзерах
-                try:
-                    # Настройки сериалайзера
-                    fields_list = ser_self.Meta.childs.get(field_name, [])
-                    if not fields_list:
-                        # Настроек нет, возвращаем обычное поле
-                        return ser_self.build_relational_field(field_name, relation_info)
-                    root_fields = fields_list
-                    if isinstance(fields_list, dict):
-                        root_fields = fields_list[self.builder.KEY_FIELDS]
-                        childs = fields_list[self.builder.KEY_CHIELDS]
-                        # инициализируем будущий сериалайзер информацией о вложеном
-                        for i, key in enumerate(childs):
-                            child = fields_list.get(key)
-                            if child:
-                                child_field[key] = child
-                    finaly_root_fields = []
-                    for field in root_fields:
-                        if isinstance(field, str):
-                            f_name = field
-                            if f_name == ALL:
-                                finaly_root_fields.extend(DynamicSerializerModel.convert_all_predicat(
-                                    relation_info.related_model._meta.fields))
-                            else:
-                                finaly_root_fields.append(f_name)
-                        else:
-                            child_field.update(field)
-                            finaly_root_fields.append(list(field.keys())[0])
-                    # Убираем дубли
-                    finaly_root_fields = list(set(finaly_root_fields))
-                except Exception as e:
-                    finaly_root_fields = ALL
-
-                class NestedSerializer(Nested):
-                    class Meta:
-                        model = relation_info.related_model
-                        depth = nested_depth - 1
-                        fields = finaly_root_fields
-                        childs = child_field
+                # Настройки сериалайзера
+                spec = ser_self.Meta.spec.get_child(field_name)
+                if spec is None:
+                    # Настроек нет, возвращаем обычное поле
+                    return ser_self.build_relational_field(field_name, relation_info)
+                related_model = relation_info.related_model
+                key = (related_model, spec, nested_depth)
+                NestedSerializer = nested_classes.get(key)
+                if NestedSerializer is None:
+                    class NestedSerializer(Nested):
+                        class Meta:
+                            model = related_model
+                            depth = nested_depth - 1
+                            fields = DynamicSerializerModel.expand_fields(spec.fields, related_model)
+
+                    NestedSerializer.Meta.spec = spec
+                    NestedSerializer = nested_classes.setdefault(key, NestedSerializer)
 
                 field_class = NestedSerializer
                 field_kwargs = get_nested_relation_kwargs(relation_info)
@@ -237,10 +301,13 @@ class DynamicSerializerModel:
 
 
 class BuildNesteting:
-    REG = "(\w+)\[(.*)\]"  # парсин строку с "field[id|name] на имя и поля
-    SPLITTER_ENUM_FIELDS = "|"  # разделитель для разделения вложенных имен полей
-    SPLITTER_STR = ","  # Как разделять строку имен полей на первом уровне
-    DOT = "."  # раздеитель вложенности
+    """
+    Разбор строки полей динамического сериалайзера в структуру вложенности
+    Разбор выполняется parse_field_spec, класс оставлен для совместимости и отдает структуру в виде словарей
+    """
+    SPLITTER_ENUM_FIELDS = SPLITTER_ENUM_FIELDS  # разделитель для разделения вложенных имен полей
+    SPLITTER_STR = SPLITTER_STR  # Как разделять строку имен полей на первом уровне
+    DOT = DOT  # раздеитель вложенности
 
     KEY_FIELDS = '_fields'
     KEY_CHIELDS = '_childs'
@@ -251,43 +318,17 @@ class BuildNesteting:
         id,name,rel1[id].rel2[id|name],rel3[id|val1]
         :param attr:
         """
-        if not isinstance(attr, (tuple, list)):
-            attr = attr.split(self.SPLITTER_STR)
-
-        self.attr = self.fix_list_attr(attr)
-        self.root_fields = []
-        self.default_depth = 1
-        self.depth = self.default_depth
-        super().__init__()
-
-    def fix_list_attr(self, attr: list):
-        """
-        Исправляем когда передали массив строк вида
-        ['id','name','rel1[__all__].rel2[__all__],simple_rel[__all__],simple_rel2[__all__]'
-        Строка rel1[__all__].rel2[__all__],simple_rel[__all__],simple_rel2[__all__]
-        преобразуется в макссив строк разделенный по запятой
-        ['rel1[__all__].rel2[__all__]','simple_rel[__all__]','simple_rel2[__all__]']
-        Потом удаляется из attr не корректная строка и мержится массив корректных строк
-        :param attr: Список полей для парсинга
-        """
-        # Испраленные строки
-        join_rel = []
-        for i, f in enumerate(attr):
-            splits = f.split(self.SPLITTER_STR)
-            if len(splits) > 1:
-                # Удаляем не корректную строку
-                attr.pop(i)
-                join_rel.extend(splits)
-        attr.extend(join_rel)
-        attr = set(attr)
-        return attr
+        if isinstance(attr, (tuple, list, set)):
+            attr = self.SPLITTER_STR.join(attr)
+        self.attr = attr
+        self.spec = parse_field_spec(attr)
 
     def parse(self):
         if not hasattr(self, '_data'):
             self._data = {
-                "_nested": self.__build_nested(fields=self.attr),
-                "_root": list(set(self.root_fields)),
-                "_depth": self.depth,
+                "_nested": self._to_nested(self.spec),
+                "_root": list(self.spec.fields),
+                "_depth": self.spec.depth,
             }
         return self._data
 
@@ -312,109 +353,16 @@ class BuildNesteting:
         assert hasattr(self, "_data"), "Вызовите команду parse"
         return self._data['_depth']
 
-    def _parse_fields(self, string, is_name=False):
-        """
-        Разбор строки на имя поля и его наборе полей
-        :param string: Строка формата rel1[id|name|val]
-        :param is_name: если указан флаг возвращает только имя поля если подходит под шаблон REG
-                        иначе вернет переданную строку
-        """
-        if not string:
-            return None
-        reg_str = re.findall(self.REG, string)
-        if reg_str:
-            if is_name:
-                return reg_str[0][0]
-            return reg_str[0]
-        if is_name:
-            return string
-
-    def __build_nested(self, fields):
-        """
-        Разбор полей и передача их в функцию для формирования вложеной структуры
-        с информацией о полях и детях
-        :param fields: перечень полей
-        :return:
-        """
-        root = None
-        nested_level_fields = {}
-        _tmp = [self.default_depth]
-        for field in fields:
-            parse = self._parse_fields(field)
-            if parse and not root:
-                root = parse[0]
-            # if parse and len(field.split(self.DOT)) == 1:
-            #     root = None
-            if parse:
-                # Разбиваем поля на уровни вложенности
-                fields_dot = field.split(self.DOT)
-                _tmp.append(len(fields_dot))
-                self.__recurse_build_node(root, fields_dot, nested_level_fields)
-                # ПОсле отработки добавили в рутовый набор полей сериалайзера 1 уровня
-                self.root_fields.append(root)
-                # Рекурсия отработала, сбрасываем рута, т.к больше нет детей
-                root = None
-            else:
-                # Поля первого уровня
-                self.root_fields.append(field)
-                continue
-        self.depth = max(_tmp)
-        return nested_level_fields
-
-    def __recurse_build_node(self, node_name: str, fields: list,
-                             obj: dict = None, depth: int = None) -> dict:
-        """
-        рекурсивное формирование структуры
-        :param node_name: Имя узла
-        :param fields: Список полей
-        :param obj: Объект для которого формируется, по умолчанию создается пустой
-        :param depth: Глубина вложенности, по умолчанию 1
-        :return: Структура
+    def _to_nested(self, spec: FieldSpec) -> dict:
         """
-        if depth is None:
-            depth = self.default_depth
-        if obj is None:
-            obj = {}
-        for field in fields:
-            root_name = self._parse_fields(field, is_name=True)
-            node = obj.get(root_name)
-            if not node:
-                # Стром структуру по умолчанию
-                node = self._init_node(root_name, obj)
-            parse_fields = self._parse_fields(field)
-            if parse_fields:
-                node[self.KEY_FIELDS].extend(parse_fields[1].split(self.SPLITTER_ENUM_FIELDS))
-            if len(fields) > 1:
-                child_name = self._parse_fields(fields[1], is_name=True)
-                node[self.KEY_CHIELDS].append(child_name)
-                node[self.KEY_FIELDS].append(child_name)
-                if depth == 1:
-                    self.root_fields.append(root_name)
-            self.node_unique_fields(node)
-            fields.pop(0)
-
-            depth += 1
-            self.__recurse_build_node(node_name, fields, node, depth)
-        return obj
-
-    def _init_node(self, key_name: str, obj: dict) -> dict:
-        """
-        Сформировать начальную структуру узла для объекта
-        :param key_name: имя будущего ключа
-        :param obj: ссылка на объект для которого нужно прекрипить узел
-        :return: Новый узел
-        """
-        obj[key_name] = {
-            self.KEY_FIELDS: [],
-            self.KEY_CHIELDS: [],
-            self.KEY_CHIELDS: [],
-        }
-        return obj[key_name]
-
-    def node_unique_fields(self, node: dict):
+        Преобразовать дерево полей в словарь вида
+        {'rel1': {'_fields': ['id', 'rel2'], '_childs': ['rel2'], 'rel2': {...}}}
         """
-        Убираем дублируемые имена
-        :param node: Узел
-        """
-        node[self.KEY_FIELDS] = list(set(node[self.KEY_FIELDS]))
-        node[self.KEY_CHIELDS] = list(set(node[self.KEY_CHIELDS]))
+        nested = {}
+        for name, child in spec.children:
+            node = nested[name] = {
+                self.KEY_FIELDS: list(child.fields),
+                self.KEY_CHIELDS: [child_name for child_name, _ in child.children],
+            }
+            node.update(self._to_nested(child))
+        return nested
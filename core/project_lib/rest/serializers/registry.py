@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from threading import RLock
+from typing import Callable, Hashable, Optional, Type
+
+from django.conf import settings
+from rest_framework import serializers
+
+
+class SerializerRegistry:
+    """
+    Ограниченный LRU реестр построенных классов динамических сериалайзеров.
+    Для одинаковых входных данных (модель, разобранные attrs, extra_bases, extra_kwargs_for_meta)
+    возвращает один и тот же класс сериалайзера вместо повторного разбора attrs и создания новых классов.
+
+    Размер реестра задается настройкой DYNAMIC_SERIALIZER_CACHE_SIZE (по умолчанию 256).
+    Пример использования:
+        serializer_registry.stats()  # {'size': 10, 'maxsize': 256, 'hits': 120, 'misses': 10, 'evictions': 0}
+        serializer_registry.invalidate(models.Teacher)  # Сбросить сериалайзеры модели
+        serializer_registry.clear()  # Сбросить все
+    """
+    DEFAULT_MAXSIZE = 256
+
+    def __init__(self, maxsize: int = None) -> None:
+        """
+        :param maxsize: Максимальное количество хранимых классов. Если не указан берется из настроек
+        """
+        self._maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self) -> int:
+        if self._maxsize is None:
+            return getattr(settings, 'DYNAMIC_SERIALIZER_CACHE_SIZE', self.DEFAULT_MAXSIZE)
+        return self._maxsize
+
+    @classmethod
+    def make_key(cls, model, attrs: Hashable, extra_bases=None, extra_kwargs_for_meta=None,
+                 options: dict = None) -> Optional[tuple]:
+        """
+        Сформировать ключ реестра
+        :param model: Класс модели
+        :param attrs: Разобранные attrs (FieldSpec)
+        :param extra_bases: Дополнительные базовые классы сериалайзера
+        :param extra_kwargs_for_meta: Словарь extra_kwargs для Meta
+        :param options: Прочие параметры построения влияющие на класс (например fast)
+        :return: Ключ или None если входные данные не хешируемые (кеширование невозможно)
+        """
+        if extra_bases is None:
+            extra_bases = ()
+        if not isinstance(extra_bases, (tuple, list)):
+            extra_bases = (extra_bases,)
+        try:
+            key = (model, attrs, tuple(extra_bases), cls._freeze(extra_kwargs_for_meta), cls._freeze(options))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    @classmethod
+    def _freeze(cls, value) -> Hashable:
+        """
+        Привести вложенные словари/списки к хешируемому виду
+        """
+        if isinstance(value, dict):
+            return tuple(sorted((k, cls._freeze(v)) for k, v in value.items()))
+        if isinstance(value, (list, tuple, set)):
+            return tuple(cls._freeze(v) for v in value)
+        return value
+
+    def get_or_build(self, key: Optional[tuple],
+                     builder: Callable[[], Type[serializers.ModelSerializer]]) -> Type[serializers.ModelSerializer]:
+        """
+        Вернуть класс из реестра или построить и сохранить новый
+        :param key: Ключ полученный из make_key. Если None - класс строится без кеширования
+        :param builder: Функция построения класса сериалайзера
+        """
+        if key is None:
+            return builder()
+        with self._lock:
+            serializer_class = self._items.get(key)
+            if serializer_class is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return serializer_class
+            self.misses += 1
+        # Строим вне блокировки, построение может быть долгим
+        serializer_class = builder()
+        with self._lock:
+            # Другой поток мог успеть построить класс, отдаем первый сохраненный
+            serializer_class = self._items.setdefault(key, serializer_class)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+        return serializer_class
+
+    def invalidate(self, model=None) -> int:
+        """
+        Удалить из реестра сериалайзеры модели
+        :param model: Класс модели. Если не указан - реестр очищается полностью
+        :return: Количество удаленных классов
+        """
+        with self._lock:
+            if model is None:
+                removed = len(self._items)
+                self._items.clear()
+                return removed
+            keys = [key for key in self._items if key[0] is model]
+            for key in keys:
+                del self._items[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """
+        Очистить реестр и сбросить счетчики
+        """
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Статистика использования реестра
+        """
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+serializer_registry = SerializerRegistry()
@@ -0,0 +1,194 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+ALL = '__all__'  # Выборка всех полей
+
+SPLITTER_STR = ','  # Разделитель полей на одном уровне
+SPLITTER_ENUM_FIELDS = '|'  # Разделитель полей внутри скобок
+DOT = '.'  # Разделитель вложенности
+OPEN = '['
+CLOSE = ']'
+NAME = 'name'
+END = 'end'
+
+PUNCTUATION = frozenset((SPLITTER_STR, SPLITTER_ENUM_FIELDS, DOT, OPEN, CLOSE))
+
+
+class FieldSpecSyntaxError(ValueError):
+    """
+    Ошибка синтаксиса строки полей динамического сериалайзера
+    """
+
+    def __init__(self, text: str, position: int, message: str) -> None:
+        self.text = text
+        self.position = position
+        self.message = message
+        pointer = ' ' * position + '^'
+        super().__init__(f'Ошибка в строке полей (позиция {position}): {message}\n{text}\n{pointer}')
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    Неизменяемое дерево полей динамического сериалайзера
+    fields - поля узла в порядке объявления (включая имена вложенных связей и __all__)
+    children - вложенные узлы (имя связи, FieldSpec)
+    Дерево хешируемое и может использоваться как ключ кеша.
+    Пример:
+        spec = parse_field_spec('id,name,rel1[id].rel2[id|name]')
+        spec.fields  # ('id', 'name', 'rel1')
+        spec.get_child('rel1').fields  # ('id', 'rel2')
+    """
+    fields: Tuple[str, ...] = ()
+    children: Tuple[Tuple[str, 'FieldSpec'], ...] = ()
+    _children_map: Dict[str, 'FieldSpec'] = field(default=None, init=False, repr=False, compare=False, hash=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, '_children_map', dict(self.children))
+
+    def get_child(self, name: str) -> Optional['FieldSpec']:
+        """
+        Получить вложенный узел связи
+        """
+        return self._children_map.get(name)
+
+    @property
+    def height(self) -> int:
+        """
+        Количество уровней вложенности ниже узла
+        """
+        if not self.children:
+            return 0
+        return 1 + max(child.height for _, child in self.children)
+
+    @property
+    def depth(self) -> int:
+        """
+        Глубина вложенности для Meta.depth сериалайзера
+        """
+        return max(1, self.height)
+
+
+class _NodeBuilder:
+    """
+    Изменяемый узел на время разбора
+    """
+    __slots__ = ('fields', 'children')
+
+    def __init__(self) -> None:
+        self.fields = {}
+        self.children = {}
+
+    def add_field(self, name: str) -> None:
+        self.fields.setdefault(name, None)
+
+    def child(self, name: str) -> '_NodeBuilder':
+        self.add_field(name)
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = _NodeBuilder()
+        return node
+
+    def freeze(self) -> FieldSpec:
+        return FieldSpec(
+            fields=tuple(self.fields),
+            children=tuple((name, node.freeze()) for name, node in self.children.items()),
+        )
+
+
+def _tokenize(text: str) -> List[Tuple[str, str, int]]:
+    """
+    Разбиение строки на лексемы (тип, значение, позиция) за один проход
+    """
+    tokens = []
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char.isspace():
+            i += 1
+        elif char in PUNCTUATION:
+            tokens.append((char, char, i))
+            i += 1
+        elif char.isalnum() or char == '_':
+            start = i
+            i += 1
+            while i < length and (text[i].isalnum() or text[i] == '_'):
+                i += 1
+            tokens.append((NAME, text[start:i], start))
+        else:
+            raise FieldSpecSyntaxError(text, i, f'недопустимый символ {char!r}')
+    tokens.append((END, '', length))
+    return tokens
+
+
+class _Parser:
+    """
+    Разбор грамматики:
+        spec  := item (',' item)*
+        item  := node ('.' node)*
+        node  := NAME ('[' NAME ('|' NAME)* ']')?
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.index = 0
+
+    def peek(self) -> str:
+        return self.tokens[self.index][0]
+
+    def expect(self, kind: str, expected: str) -> str:
+        token_kind, value, position = self.tokens[self.index]
+        if token_kind != kind:
+            got = 'конец строки' if token_kind == END else repr(value)
+            raise FieldSpecSyntaxError(self.text, position, f'ожидалось {expected}, получено {got}')
+        self.index += 1
+        return value
+
+    def parse(self) -> FieldSpec:
+        root = _NodeBuilder()
+        while self.peek() != END:
+            if self.peek() == SPLITTER_STR:
+                # Пустые элементы (",,", завершающая запятая) пропускаем
+                self.index += 1
+                continue
+            self.parse_item(root)
+            if self.peek() != END:
+                self.expect(SPLITTER_STR, "','")
+        return root.freeze()
+
+    def parse_item(self, root: _NodeBuilder) -> None:
+        node = root
+        while True:
+            name = self.expect(NAME, 'имя поля')
+            if self.peek() == OPEN:
+                self.index += 1
+                child = node.child(name)
+                child.add_field(self.expect(NAME, 'имя поля'))
+                while self.peek() == SPLITTER_ENUM_FIELDS:
+                    self.index += 1
+                    child.add_field(self.expect(NAME, 'имя поля'))
+                self.expect(CLOSE, "'|' или ']'")
+            elif self.peek() == DOT:
+                child = node.child(name)
+            else:
+                # Простое поле в конце цепочки
+                node.add_field(name)
+                return
+            if self.peek() != DOT:
+                return
+            self.index += 1
+            node = child
+
+
+@lru_cache(maxsize=1024)
+def parse_field_spec(text: str) -> FieldSpec:
+    """
+    Разобрать строку полей в дерево FieldSpec. Результат кешируется по строке
+    Формат: id,name,rel1[id|name].rel2[id],rel3[__all__]
+    :param text: Строка полей
+    :raise FieldSpecSyntaxError: Ошибка синтаксиса с позицией ошибки
+    """
+    return _Parser(text).parse()
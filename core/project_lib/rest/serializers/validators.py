@@ -0,0 +1,140 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.validators import UniqueValidator
+
+DUPLICATE_MESSAGE = 'Значение повторяется в передаваемых данных.'
+
+
+class BatchUniqueCheck:
+    """
+    Проверка уникальности одного поля для всего списка: один запрос __in и проверка повторов внутри данных
+    """
+
+    def __init__(self, field: serializers.Field, validator: UniqueValidator) -> None:
+        self.field = field
+        self.validator = validator
+        self.source = field.source_attrs[-1]
+
+    def run(self, values: Dict[int, object], item_pks: Dict[int, Optional[str]]) -> Dict[int, str]:
+        """
+        :param values: Значения поля по индексам элементов (уже приведенные полем)
+        :param item_pks: Первичные ключи изменяемых записей по индексам элементов
+        :return: Сообщения об ошибках по индексам элементов
+        """
+        errors = {}
+        seen = {}
+        for index, value in values.items():
+            if value in seen:
+                errors[index] = DUPLICATE_MESSAGE
+            else:
+                seen[value] = index
+        if not seen:
+            return errors
+        existing = defaultdict(set)
+        queryset = self.validator.queryset.filter(**{f'{self.source}__in': list(seen)})
+        for value, pk in queryset.values_list(self.source, 'pk'):
+            existing[value].add(str(pk))
+        # Записи из этих же данных, у которых значение меняется, конфликтом не считаются
+        moving = {item_pks[index]: value for index, value in values.items() if item_pks.get(index)}
+        for index, value in values.items():
+            if index in errors:
+                continue
+            own_pk = item_pks.get(index)
+            conflicts = {pk for pk in existing.get(value, ()) if pk != own_pk and moving.get(pk, value) == value}
+            if conflicts:
+                errors[index] = self.validator.message
+        return errors
+
+
+# noinspection PyUnresolvedReferences
+class BatchUniqueListSerializerMixin:
+    """
+    Проверка уникальности полей списка одним запросом на поле вместо UniqueValidator на каждый элемент.
+    Валидаторы UniqueValidator (lookup exact) снимаются с полей child, значения всех элементов
+    проверяются запросом __in и на повторы внутри данных, ошибки добавляются к соответствующим элементам.
+    Пример:
+        class UserListSerializer(BatchUniqueListSerializerMixin, ListSerializer):
+            pass
+    """
+
+    def get_batch_unique_checks(self) -> List[BatchUniqueCheck]:
+        checks = self.__dict__.get('_batch_unique_checks')
+        if checks is not None:
+            return checks
+        checks = []
+        for field in self.child.fields.values():
+            if field.read_only:
+                continue
+            validators = list(field.validators)
+            batched = [v for v in validators
+                       if type(v) is UniqueValidator and v.lookup == 'exact' and len(field.source_attrs) == 1]
+            if not batched:
+                continue
+            field.validators = [v for v in validators if v not in batched]
+            checks.extend(BatchUniqueCheck(field, v) for v in batched)
+        self._batch_unique_checks = checks
+        return checks
+
+    def get_item_pk(self, index: int, item: dict) -> Optional[str]:
+        """
+        Первичный ключ записи которую изменяет элемент (исключается из проверки)
+        """
+        instances = getattr(self, 'instances_for_data', None)
+        if instances:
+            instance = instances[index]
+            return None if instance is None else str(instance.pk)
+        pk = item.get(getattr(self, 'id_attr', 'id'))
+        if not pk:
+            return None
+        try:
+            return str(self.child.Meta.model._meta.pk.to_python(pk))
+        except Exception:
+            return str(pk)
+
+    def batch_unique_errors(self, data: list) -> List[dict]:
+        """
+        Ошибки уникальности по элементам списка
+        """
+        checks = self.get_batch_unique_checks()
+        errors = [{} for _ in data]
+        if not checks:
+            return errors
+        items = [(index, item) for index, item in enumerate(data) if isinstance(item, dict)]
+        item_pks = {index: self.get_item_pk(index, item) for index, item in items}
+        for check in checks:
+            values = {}
+            for index, item in items:
+                if check.field.field_name not in item or item[check.field.field_name] is None:
+                    continue
+                try:
+                    values[index] = check.field.to_internal_value(item[check.field.field_name])
+                except ValidationError:
+                    # Некорректное значение сообщит само поле
+                    continue
+            for index, message in check.run(values, item_pks).items():
+                errors[index][check.field.field_name] = [ErrorDetail(str(message), code='unique')]
+        return errors
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+        unique_errors = self.batch_unique_errors(data)
+        try:
+            validated = super().to_internal_value(data)
+        except ValidationError as exc:
+            if not isinstance(exc.detail, list) or len(exc.detail) != len(data):
+                raise
+            # Ошибки полей имеют приоритет над ошибками уникальности того же поля
+            raise ValidationError([{**unique, **item} for unique, item in zip(unique_errors, exc.detail)])
+        if any(unique_errors):
+            raise ValidationError(unique_errors)
+        return validated
+
+
+class BatchUniqueListSerializer(BatchUniqueListSerializerMixin, serializers.ListSerializer):
+    """
+    ListSerializer с пакетной проверкой уникальности
+    """
@@ -0,0 +1,178 @@
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+from django.db.models import F, QuerySet
+from rest_framework import serializers
+
+from ..metrics import start_serialization, stop_serialization
+from ..query_plan import get_relation_field
+from .fast import MANY, VALUE, ExtractionPlan, FastListSerializer
+
+PARENT_KEY = '_parent_pk_'  # Ключ строки с первичным ключом родителя для склейки вложенных записей
+
+
+class ValuesEngine:
+    """
+    Чтение данных динамического сериалайзера через .values() без создания экземпляров моделей.
+    Корневой запрос и каждая вложенная связь выполняются отдельным запросом .values(),
+    вложенные строки склеиваются с родительскими по внешнему ключу в словарях.
+    Результат формируется планом извлечения (ExtractionPlan) и совпадает с обычным сериалайзером.
+
+    Если в сериалайзере есть поля которым нужен экземпляр модели (SerializerMethodField, файлы и т.п.)
+    или собственные валидаторы, движок не применяется (supports вернет False).
+    Пример:
+        serializer = DynamicSerializerModel(model=models.Student, attrs="__all__,group[id|name]").build(fast=True)()
+        if ValuesEngine.supports(serializer):
+            data = ValuesEngine(serializer).represent(models.Student.objects.all())
+    """
+    chunk_size = 500  # Максимальное количество ключей в одном запросе __in
+
+    def __init__(self, serializer: serializers.ModelSerializer) -> None:
+        """
+        :param serializer: Экземпляр сериалайзера одной записи (для ListSerializer - child)
+        """
+        self.serializer = serializer
+        self.plan = ExtractionPlan.for_serializer(serializer)
+
+    @classmethod
+    def supports(cls, serializer: serializers.ModelSerializer) -> bool:
+        """
+        Можно ли получить данные сериалайзера через .values()
+        """
+        serializer_class = type(serializer)
+        if '_values_engine_supported' not in serializer_class.__dict__:
+            plan = ExtractionPlan.for_serializer(serializer)
+            serializer_class._values_engine_supported = plan.supports_rows and cls._check_node(serializer, plan)
+        return serializer_class._values_engine_supported
+
+    @classmethod
+    def _check_node(cls, serializer, plan: ExtractionPlan) -> bool:
+        """
+        Проверка узла: все значения - колонки модели, все вложенные - связи модели, нет своих валидаторов
+        """
+        if cls._has_custom_validators(serializer):
+            return False
+        model = serializer.Meta.model
+        concrete_fields = {f.name for f in model._meta.concrete_fields}
+        for step in plan.steps:
+            if step.kind == VALUE:
+                if step.source not in concrete_fields:
+                    return False
+                continue
+            if get_relation_field(model, step.source) is None:
+                return False
+            child = serializer.fields[step.name]
+            if step.kind == MANY:
+                child = child.child
+            if not cls._check_node(child, step.child_plan):
+                return False
+        return True
+
+    @staticmethod
+    def _has_custom_validators(serializer) -> bool:
+        serializer_class = type(serializer)
+        if getattr(serializer.Meta, 'validators', None):
+            return True
+        if serializer_class.validate is not serializers.Serializer.validate:
+            return True
+        base_names = set(dir(serializers.ModelSerializer))  # validate_empty_values и т.п.
+        return any(name.startswith('validate_') and name not in base_names for name in dir(serializer_class))
+
+    def represent(self, queryset: QuerySet, pks: Optional[list] = None) -> list:
+        """
+        Представление записей QuerySet
+        :param queryset: Корневой QuerySet
+        :param pks: Первичные ключи страницы. Если переданы - выбираются только они и в этом порядке
+        """
+        rows = self.fetch(queryset, pks)
+        return self.plan.represent_many(rows, self.serializer, rows=True)
+
+    def fetch(self, queryset: QuerySet, pks: Optional[list] = None) -> List[dict]:
+        """
+        Получить строки со вложенными строками связей
+        :param queryset: Корневой QuerySet
+        :param pks: Первичные ключи страницы. Если переданы - выбираются только они и в этом порядке
+        """
+        # prefetch_related/only не совместимы с .values(), связи подтягиваются своими запросами
+        queryset = queryset.prefetch_related(None)
+        if pks is None:
+            return self._fetch_level(self.serializer, self.plan, queryset)
+        pk_name = queryset.model._meta.pk.name
+        rows = []
+        for chunk in self._chunks(pks):
+            rows.extend(self._fetch_level(self.serializer, self.plan, queryset.filter(pk__in=chunk)))
+        position = {pk: i for i, pk in enumerate(pks)}
+        rows.sort(key=lambda row: position.get(row[pk_name], len(position)))
+        return rows
+
+    def _fetch_level(self, serializer, plan: ExtractionPlan, queryset: QuerySet,
+                     parent_lookup: str = None) -> List[dict]:
+        """
+        Выборка строк одного уровня и рекурсивная склейка вложенных связей
+        :param parent_lookup: Путь от модели уровня к родителю. Значение попадает в строку под ключом PARENT_KEY
+        """
+        model = serializer.Meta.model
+        pk_name = model._meta.pk.name
+        columns = [pk_name]
+        relations = []
+        for step in plan.steps:
+            if step.kind == VALUE:
+                columns.append(step.source)
+                continue
+            field = get_relation_field(model, step.source)
+            child = serializer.fields[step.name]
+            relations.append((step, field, child.child if step.kind == MANY else child))
+            if field.concrete and not field.many_to_many:
+                # Прямая связь: значение внешнего ключа нужно для выборки связанных строк
+                columns.append(step.source)
+        annotations = {}
+        if parent_lookup:
+            annotations[PARENT_KEY] = F(parent_lookup)
+        rows = list(queryset.values(*dict.fromkeys(columns), **annotations))
+        for step, field, child in relations:
+            child_queryset = field.related_model._default_manager.all()
+            if field.concrete and not field.many_to_many:
+                keys = list({row[step.source] for row in rows if row[step.source] is not None})
+                child_pk_name = field.related_model._meta.pk.name
+                by_pk = {}
+                for chunk in self._chunks(keys):
+                    for child_row in self._fetch_level(child, step.child_plan, child_queryset.filter(pk__in=chunk)):
+                        by_pk[child_row[child_pk_name]] = child_row
+                for row in rows:
+                    row[step.source] = by_pk.get(row[step.source])
+                continue
+            # Обратные связи и ManyToMany: выбираем дочерние строки по ключам родителей
+            lookup = field.field.name if field.auto_created else field.related_query_name()
+            grouped = defaultdict(list)
+            for chunk in self._chunks([row[pk_name] for row in rows]):
+                child_rows = self._fetch_level(child, step.child_plan,
+                                               child_queryset.filter(**{f'{lookup}__in': chunk}), lookup)
+                for child_row in child_rows:
+                    grouped[child_row[PARENT_KEY]].append(child_row)
+            for row in rows:
+                items = grouped.get(row[pk_name], [])
+                if step.kind == MANY:
+                    row[step.source] = items
+                else:
+                    row[step.source] = items[0] if items else None
+        return rows
+
+    def _chunks(self, keys: list) -> Iterable[list]:
+        for i in range(0, len(keys), self.chunk_size):
+            yield keys[i:i + self.chunk_size]
+
+
+class ValuesListSerializer(FastListSerializer):
+    """
+    Список для сериалайзеров с engine='values'
+    QuerySet читается через ValuesEngine, остальные данные (списки экземпляров) - планом извлечения
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, QuerySet) and ValuesEngine.supports(self.child):
+            started = start_serialization()
+            try:
+                return ValuesEngine(self.child).represent(data)
+            finally:
+                stop_serialization(started)
+        return super().to_representation(data)
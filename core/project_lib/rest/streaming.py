@@ -0,0 +1,136 @@
+import json
+from typing import Iterable, Iterator
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from loguru import logger
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers.fast import ExtractionPlan, FastRepresentationMixin
+from .serializers.values_engine import ValuesEngine, ValuesListSerializer
+
+
+class StreamingJSONList:
+    """
+    Генератор JSON ответа списка: {"count": N, "count_exact": true, "results": [...]}
+    Записи читаются из QuerySet порциями через .iterator(chunk_size) и сериализуются по одной,
+    в память попадает не более одной порции записей независимо от размера выборки.
+    Пример:
+        StreamingHttpResponse(StreamingJSONList(queryset, serializer, count=100), content_type='application/json')
+    """
+    encoder_class = JSONEncoder
+
+    def __init__(self, queryset: QuerySet, serializer, count: int = None, chunk_size: int = 500,
+                 count_exact: bool = True) -> None:
+        """
+        :param queryset: QuerySet записей (может быть срезом страницы)
+        :param serializer: Экземпляр сериалайзера одной записи
+        :param count: Значение поля count. Если None - ответ отдается массивом без обертки
+        :param chunk_size: Количество записей читаемых из БД за один запрос
+        :param count_exact: count точное значение, а не оценка
+        """
+        self.queryset = queryset
+        self.serializer = serializer
+        self.count = count
+        self.chunk_size = chunk_size
+        self.count_exact = count_exact
+
+    def __iter__(self) -> Iterator[str]:
+        if self.count is not None:
+            yield '{"count":%s,"count_exact":%s,"results":' % (self.dumps(self.count), self.dumps(self.count_exact))
+        yield '['
+        first = True
+        try:
+            for chunk in self.iter_chunks():
+                if not chunk:
+                    continue
+                body = ','.join(self.dumps(item) for item in chunk)
+                yield body if first else ',' + body
+                first = False
+        except Exception:
+            # Заголовки уже отправлены, статус ответа изменить нельзя. Обрываем поток некорректным JSON
+            logger.exception('Ошибка потоковой отдачи списка')
+            raise
+        yield ']'
+        if self.count is not None:
+            yield '}'
+
+    def iter_chunks(self) -> Iterable[list]:
+        """
+        Представления записей порциями по chunk_size
+        """
+        serializer = self.serializer
+        list_serializer_class = getattr(getattr(serializer, 'Meta', None), 'list_serializer_class', None)
+        if (list_serializer_class and issubclass(list_serializer_class, ValuesListSerializer)
+                and ValuesEngine.supports(serializer)):
+            # Порция первичных ключей -> запросы .values() только по этим ключам
+            engine = ValuesEngine(serializer)
+            pk_name = self.queryset.model._meta.pk.name
+            for pks in self._chunked(self.queryset.values_list(pk_name, flat=True)):
+                yield engine.represent(self.queryset, pks=pks)
+            return
+        if isinstance(serializer, FastRepresentationMixin):
+            plan = ExtractionPlan.for_serializer(serializer)
+            for instances in self._chunked(self.queryset):
+                yield plan.represent_many(instances, serializer)
+            return
+        for instances in self._chunked(self.queryset):
+            yield [serializer.to_representation(instance) for instance in instances]
+
+    def _chunked(self, queryset: QuerySet) -> Iterable[list]:
+        # С chunk_size prefetch_related выполняется для каждой порции отдельно
+        chunk = []
+        for item in queryset.iterator(chunk_size=self.chunk_size):
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def dumps(self, data) -> str:
+        return json.dumps(data, cls=self.encoder_class, ensure_ascii=False, separators=(',', ':'))
+
+
+# noinspection PyUnresolvedReferences
+class StreamingListMixin:
+    """
+    Примесь к представлению для потоковой отдачи больших списков.
+    Включается параметром запроса ?stream=1 или атрибутом streaming_list = True.
+    Срез страницы и count берутся у пагинатора (если он поддерживает slice_queryset),
+    при фильтрации без limit отдается вся выборка без загрузки ее в память.
+    Пример:
+        class CustomUserViewSet(StreamingListMixin, ModelViewSet):
+            queryset = models.CustomUser.objects.all()
+            serializer_class = serializers.CustomUserSerializer
+            stream_chunk_size = 1000
+    """
+    streaming_list = False  # Всегда отдавать список потоком
+    stream_query_param = 'stream'
+    stream_chunk_size = 500  # Количество записей читаемых из БД за один запрос
+    streaming_list_class = StreamingJSONList
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_streaming(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        count = None
+        count_exact = True
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, 'slice_queryset'):
+            queryset = paginator.slice_queryset(queryset, request)
+            count = paginator.count
+            count_exact = getattr(paginator, 'count_exact', True)
+        content = self.streaming_list_class(queryset, self.get_serializer(), count=count,
+                                            chunk_size=self.stream_chunk_size, count_exact=count_exact)
+        response = StreamingHttpResponse(content, content_type='application/json; charset=utf-8')
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def is_streaming(self, request) -> bool:
+        """
+        Отдавать ли текущий список потоком
+        """
+        if self.streaming_list:
+            return True
+        return request.query_params.get(self.stream_query_param, '').lower() in ('1', 'true', 'yes')
@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from UniformNew.core.apps.custom_auth.models import CustomUser
-from UniformNew.core.project_lib.rest.serializers import DynamicSerializerModel
+from apps.custom_auth.models import CustomUser
+from project_lib.rest.serializers import DynamicSerializerModel
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -14,4 +14,4 @@ class CustomUserSerializer(serializers.ModelSerializer):
 
 
 fields = '__all__,soldiers[__all__].service_records[__all__],role_users[__all__].role[id|name]'
-
+DetailUserSerializer = DynamicSerializerModel(model=CustomUser, attrs=fields).build()